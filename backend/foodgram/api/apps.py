@@ -2,5 +2,8 @@ from django.apps import AppConfig
 
 
 class ApiConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
+    default_auto_field = 'django.db.models.AutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
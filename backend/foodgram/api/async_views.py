@@ -0,0 +1,192 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import Page, Paginator
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed, NotAcceptable
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from users.models import Subscribe
+from users.views import SubscriptionsList, subscribed_recipes
+from .cache import get_user_flags
+from .metrics import async_route
+from .serializers import RecipeSerializer, SubscribeSerializer
+from .utils import attachment_response, shopping_cart_chunks
+from .views import SHOPPING_CART_RENDERERS, RecipeViewSet
+
+recipe_list_view = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+shared_recipe_list_view = RecipeViewSet.as_view(
+    {'get': 'list'}, with_user_flags=False)
+download_shopping_cart_view = RecipeViewSet.as_view(
+    {'get': 'download_shopping_cart'}, detail=False,
+    **RecipeViewSet.download_shopping_cart.kwargs)
+subscriptions_view = SubscriptionsList.as_view({'get': 'list'})
+
+
+def csrf_exempt(view):
+    """Отключить проверку CSRF для асинхронного представления.
+
+    csrf_exempt из Django 3.2 не поддерживает асинхронные представления,
+    а запросам с токеном DRF проверка CSRF не нужна.
+    """
+    view.csrf_exempt = True
+    return view
+
+
+def in_thread(function, *args):
+    """Выполнить функцию в отдельном потоке.
+
+    Вызовы из одного запроса идут параллельно, у каждого потока своё
+    соединение с базой.
+    """
+
+    def call():
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)()
+
+
+def delegate(view, request):
+    """Передать запрос синхронному представлению DRF."""
+    return sync_to_async(view)(request)
+
+
+def authenticate(request):
+    """Аутентификация по токену до вызова представлений DRF.
+
+    Результат сохраняется в запросе, и DRF не проверяет токен повторно.
+    Ошибку аутентификации вернёт синхронное представление.
+    """
+    try:
+        result = TokenAuthentication().authenticate(Request(request))
+    except AuthenticationFailed:
+        return AnonymousUser()
+    if result is None:
+        return AnonymousUser()
+    request._force_auth_user, request._force_auth_token = result
+    return result[0]
+
+
+def negotiate(request, renderer_classes):
+    negotiator = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS()
+    try:
+        renderer, _ = negotiator.select_renderer(
+            Request(request),
+            [renderer_class() for renderer_class in renderer_classes])
+    except NotAcceptable:
+        return None
+    return renderer
+
+
+@csrf_exempt
+@async_route({'GET': 'RecipeViewSet.list'})
+async def recipe_list(request):
+    """Список рецептов.
+
+    Общее для всех тело ответа и флаги пользователя загружаются
+    параллельно.
+    """
+    if request.method != 'GET':
+        return await delegate(recipe_list_view, request)
+    user = await sync_to_async(authenticate)(request)
+    if not user.is_authenticated:
+        return await delegate(recipe_list_view, request)
+    response, flags = await asyncio.gather(
+        delegate(shared_recipe_list_view, request),
+        in_thread(get_user_flags, user),
+    )
+    if response.status_code == status.HTTP_200_OK:
+        for recipe in response.data['results']:
+            RecipeSerializer.apply_user_flags(recipe, flags)
+    return response
+
+
+def subscriptions_page(user, page_number, page_size, recipes_limit):
+    """Число подписок, подписки страницы и рецепты их авторов.
+
+    Все три выборки независимы и выполняются параллельно.
+    """
+    subscribed = Subscribe.objects.filter(user=user).order_by('-id')
+    offset = (page_number - 1) * page_size
+    page = slice(offset, offset + page_size)
+    return asyncio.gather(
+        in_thread(subscribed.count),
+        in_thread(lambda: list(subscribed.select_related(
+            'author', 'author__counters')[page])),
+        in_thread(lambda: list(subscribed_recipes(
+            subscribed.values('author')[page], recipes_limit))),
+    )
+
+
+def render_subscriptions(request, subscriptions, recipes, page):
+    newest = {}
+    for recipe in recipes:
+        newest.setdefault(recipe.author_id, []).append(recipe)
+    for subscription in subscriptions:
+        subscription.author.newest_recipes = newest.get(
+            subscription.author_id, [])
+    pagination = SubscriptionsList.pagination_class()
+    pagination.request = Request(request)
+    pagination.page = page
+    pagination.cursor_paginator = None
+    data = pagination.get_paginated_response(SubscribeSerializer(
+        subscriptions, many=True,
+        context={'request': pagination.request}).data).data
+    return HttpResponse(JSONRenderer().render(data),
+                        content_type='application/json')
+
+
+@csrf_exempt
+@async_route({'GET': 'SubscriptionsList.list'})
+async def subscriptions(request):
+    """Подписки с последними рецептами авторов.
+
+    Курсорная пагинация и ошибки обрабатываются синхронным
+    представлением.
+    """
+    user = await sync_to_async(authenticate)(request)
+    pagination = SubscriptionsList.pagination_class()
+    page_number = request.GET.get(pagination.page_query_param, '1')
+    if (request.method != 'GET' or not user.is_authenticated
+            or pagination.cursor_query_param in request.GET
+            or not page_number.isdigit() or int(page_number) < 1):
+        return await delegate(subscriptions_view, request)
+    page_number = int(page_number)
+    page_size = pagination.get_page_size(Request(request))
+    count, subscriptions, recipes = await subscriptions_page(
+        user, page_number, page_size, request.GET.get('recipes_limit'))
+    if not subscriptions and page_number > 1:
+        return await delegate(subscriptions_view, request)
+    paginator = Paginator([], page_size)
+    paginator.count = count
+    return await sync_to_async(render_subscriptions)(
+        request, subscriptions, recipes,
+        Page(subscriptions, page_number, paginator))
+
+
+@csrf_exempt
+@async_route({'GET': 'RecipeViewSet.download_shopping_cart'})
+async def download_shopping_cart(request):
+    """Список покупок.
+
+    Файл строится в отдельном потоке целиком: ASGI-обработчик Django
+    перебирает части потокового ответа в цикле событий, где запросы
+    к базе запрещены.
+    """
+    user = await sync_to_async(authenticate)(request)
+    renderer = negotiate(request, SHOPPING_CART_RENDERERS)
+    if (request.method != 'GET' or not user.is_authenticated
+            or renderer is None):
+        return await delegate(download_shopping_cart_view, request)
+    content = await in_thread(
+        lambda: b''.join(shopping_cart_chunks(user, renderer.format)))
+    return attachment_response([content], renderer.format)
@@ -0,0 +1,74 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """Отсортированный индекс ингредиентов в памяти процесса.
+
+    Строится при первом обращении, сбрасывается сигналами модели Ingredient
+    и перестраивается не реже INGREDIENT_INDEX_TTL секунд, чтобы изменения,
+    сделанные в других процессах, тоже попадали в выдачу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _build(self):
+        rows = sorted(
+            (name.casefold(), pk, name, unit)
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit')
+        )
+        keys = [row[0] for row in rows]
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in rows
+        ]
+        ids = frozenset(item['id'] for item in items)
+        return time.monotonic(), keys, items, ids
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        ttl = settings.INGREDIENT_INDEX_TTL
+        if snapshot is None or time.monotonic() - snapshot[0] > ttl:
+            with self._lock:
+                if self._snapshot is snapshot:
+                    self._snapshot = self._build()
+                snapshot = self._snapshot
+        return snapshot
+
+    @property
+    def ids(self):
+        return self._get_snapshot()[3]
+
+    def search(self, query, limit):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        _, keys, items, _ = self._get_snapshot()
+        query = query.strip().casefold()
+        if not query:
+            return items[:limit]
+        result = []
+        position = bisect.bisect_left(keys, query)
+        while (position < len(keys) and len(result) < limit
+               and keys[position].startswith(query)):
+            result.append(items[position])
+            position += 1
+        if len(result) < limit:
+            for key, item in zip(keys, items):
+                if query in key and not key.startswith(query):
+                    result.append(item)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
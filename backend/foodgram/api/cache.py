@@ -0,0 +1,95 @@
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from users.models import Subscribe
+from .metrics import cache_result
+from .models import FavoriteRecipe, ShoppingList
+
+RECIPES_LIST_VERSION = 'recipes_list_version'
+RECIPES_SHARED_VERSION = 'recipes_shared_version'
+
+
+def get_versions(*keys):
+    """Текущие версии данных, для отсутствующих ключей создаются новые."""
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid4().hex, None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def get_version(key):
+    return get_versions(key)[0]
+
+
+def bump_version(*keys):
+    """Сменить версии после фиксации текущей транзакции."""
+    transaction.on_commit(
+        lambda: cache.set_many({key: uuid4().hex for key in keys}, None))
+
+
+def shopping_cart_version_key(user_id):
+    return f'shopping_cart_version:{user_id}'
+
+
+def recipe_version_key(recipe_id):
+    return f'recipe_version:{recipe_id}'
+
+
+def bump_recipes(*recipe_ids):
+    bump_version(
+        RECIPES_LIST_VERSION,
+        *(recipe_version_key(recipe_id) for recipe_id in recipe_ids)
+    )
+
+
+def bump_all_recipes():
+    bump_version(RECIPES_LIST_VERSION, RECIPES_SHARED_VERSION)
+
+
+def user_flags_version_key(user_id):
+    return f'user_flags_version:{user_id}'
+
+
+def recipe_response_key(request, pk=None, user_id=None):
+    """Ключ ответа списка или рецепта с учётом версий и строки запроса.
+
+    user_id передаётся, если содержимое ответа зависит от пользователя
+    (например, при фильтрации по избранному).
+    """
+    if pk is None:
+        keys = [RECIPES_LIST_VERSION]
+    else:
+        keys = [RECIPES_SHARED_VERSION, recipe_version_key(pk)]
+    if user_id is not None:
+        keys.append(user_flags_version_key(user_id))
+    versions = get_versions(*keys)
+    query = hashlib.md5(
+        request.GET.urlencode().encode()).hexdigest()
+    return (f'recipes:{request.get_host()}:{":".join(versions)}:'
+            f'{pk}:{user_id}:{query}')
+
+
+def get_user_flags(user):
+    """Избранное, список покупок и подписки пользователя."""
+    version = get_version(user_flags_version_key(user.id))
+    key = f'user_flags:{user.id}:{version}'
+    flags = cache.get(key)
+    cache_result('user_flags', flags is not None)
+    if flags is None:
+        flags = {
+            'favorites': frozenset(FavoriteRecipe.objects.filter(
+                user=user).values_list('recipe_id', flat=True)),
+            'shopping_cart': frozenset(ShoppingList.objects.filter(
+                user=user).values_list('recipe_id', flat=True)),
+            'subscriptions': frozenset(Subscribe.objects.filter(
+                user=user).values_list('author_id', flat=True)),
+        }
+        cache.set(key, flags, settings.USER_FLAGS_CACHE_TIMEOUT)
+    return flags
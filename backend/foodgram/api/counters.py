@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Subscribe, UserCounters
+from .models import FavoriteRecipe, Recipe, ShoppingList
+
+User = get_user_model()
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно изменить счётчик, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_recipe_counter(recipe_id, field, delta):
+    change_counter(Recipe.objects.filter(pk=recipe_id), field, delta)
+
+
+def change_user_counter(user_id, field, delta):
+    counters = UserCounters.objects.filter(user_id=user_id)
+    if not change_counter(counters, field, delta) and delta > 0:
+        UserCounters.objects.get_or_create(user_id=user_id)
+        change_counter(counters, field, delta)
+
+
+def count_subquery(queryset, field):
+    """Число строк queryset, ссылающихся полем field на внешнюю строку."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def recipe_counters():
+    return {
+        'favorites_count': count_subquery(FavoriteRecipe.objects, 'recipe'),
+        'in_carts_count': count_subquery(ShoppingList.objects, 'recipe'),
+    }
+
+
+def user_counters():
+    return {
+        'recipes_count': count_subquery(Recipe.objects, 'author'),
+        'followers_count': count_subquery(Subscribe.objects, 'author'),
+    }
+
+
+def drifted(queryset, counters):
+    """Строки, у которых сохранённые счётчики расходятся с реальными."""
+    return queryset.annotate(**{
+        f'actual_{field}': value for field, value in counters.items()
+    }).exclude(**{field: F(f'actual_{field}') for field in counters})
+
+
+def rebuild_recipe_counters():
+    """Пересчитать счётчики рецептов, вернуть число расхождений."""
+    count = drifted(Recipe.objects.all(), recipe_counters()).count()
+    Recipe.objects.update(**recipe_counters())
+    return count
+
+
+def rebuild_user_counters():
+    """Пересчитать счётчики пользователей, вернуть число расхождений."""
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=user_id) for user_id in User.objects.exclude(
+            counters__isnull=False).values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    count = drifted(UserCounters.objects.all(), user_counters()).count()
+    UserCounters.objects.update(**user_counters())
+    return count
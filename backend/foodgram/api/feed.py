@@ -0,0 +1,123 @@
+from heapq import merge
+from itertools import islice
+
+from django.conf import settings
+
+from users.models import Subscribe, UserCounters
+from .models import FeedItem, Recipe
+
+
+def is_popular_author(author_id):
+    """У автора столько подписчиков, что рассылать его рецепты дорого."""
+    return UserCounters.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def fan_out(recipe):
+    """Записать новый рецепт в ленты подписчиков автора."""
+    if is_popular_author(recipe.author_id):
+        return
+    followers = Subscribe.objects.filter(
+        author_id=recipe.author_id).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, recipe=recipe, author_id=recipe.author_id)
+         for user_id in followers.iterator()),
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавить в ленту нового подписчика последние рецепты автора."""
+    if is_popular_author(author_id):
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-id').values_list('id', flat=True)[:settings.FEED_BACKFILL]
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+         for recipe_id in recipes),
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_id, batch_size=10000):
+    """Добавить последние рецепты автора в ленты всех его подписчиков.
+
+    Нужно, когда автор перестаёт быть популярным: его рецепты больше
+    не берутся при чтении, а в лентах нет ни опубликованных за это
+    время рецептов, ни рецептов для подписавшихся за это время.
+    """
+    recipes = list(Recipe.objects.filter(author_id=author_id).order_by(
+        '-id').values_list('id', flat=True)[:settings.FEED_BACKFILL])
+    followers = Subscribe.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    return create_items(
+        (FeedItem(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+         for user_id in followers.iterator() for recipe_id in recipes),
+        batch_size, ignore_conflicts=True,
+    )
+
+
+def create_items(items, batch_size, ignore_conflicts=False):
+    """Записать строки лент пакетами, вернуть их число."""
+    count = 0
+    batch = list(islice(items, batch_size))
+    while batch:
+        FeedItem.objects.bulk_create(
+            batch, ignore_conflicts=ignore_conflicts)
+        count += len(batch)
+        batch = list(islice(items, batch_size))
+    return count
+
+
+def remove(user_id, author_id):
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def feed_recipe_ids(user, before=None, limit=6):
+    """id рецептов ленты по убыванию, меньше before.
+
+    Рецепты популярных авторов не рассылаются заранее и берутся из
+    таблицы рецептов при чтении; обе выборки идут по индексам
+    в порядке убывания id и сливаются.
+    """
+    pushed = FeedItem.objects.filter(user=user)
+    pulled = Recipe.objects.filter(author__in=Subscribe.objects.filter(
+        user=user,
+        author__counters__followers_count__gt=(
+            settings.FEED_FANOUT_MAX_FOLLOWERS),
+    ).values('author'))
+    if before is not None:
+        pushed = pushed.filter(recipe_id__lt=before)
+        pulled = pulled.filter(id__lt=before)
+    pushed = pushed.order_by('-recipe_id').values_list(
+        'recipe_id', flat=True)[:limit]
+    pulled = pulled.order_by('-id').values_list('id', flat=True)[:limit]
+    ids = []
+    for recipe_id in merge(pushed, pulled, reverse=True):
+        # Рецепт автора, ставшего популярным, может быть в обеих выборках.
+        if not ids or ids[-1] != recipe_id:
+            ids.append(recipe_id)
+    return ids[:limit]
+
+
+def rebuild_feeds(batch_size=10000):
+    """Заново заполнить ленты по текущим подпискам, вернуть число строк."""
+    FeedItem.objects.all().delete()
+    subscriptions = Subscribe.objects.exclude(
+        author__counters__followers_count__gt=(
+            settings.FEED_FANOUT_MAX_FOLLOWERS)
+    ).values_list('user_id', 'author_id')
+    recipes = {}
+    newest = Recipe.objects.filter(
+        author__in=Subscribe.objects.values('author')
+    ).newest_per_author(settings.FEED_BACKFILL)
+    for recipe_id, author_id in newest.values_list('id', 'author_id'):
+        recipes.setdefault(author_id, []).append(recipe_id)
+    items = (
+        FeedItem(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+        for user_id, author_id in subscriptions.iterator()
+        for recipe_id in recipes.get(author_id, ())
+    )
+    return create_items(items, batch_size)
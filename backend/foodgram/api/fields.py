@@ -0,0 +1,128 @@
+import base64
+import binascii
+from tempfile import SpooledTemporaryFile
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+
+from .metrics import IMAGE_UPLOAD_BYTES
+
+
+class Base64ImageField(serializers.ImageField):
+    """Изображение в base64, декодируемое по частям во временный файл.
+
+    Формат и размеры проверяются по заголовку, до декодирования всей строки,
+    размер — по мере декодирования.
+    """
+    chunk_size = 64 * 1024
+    header_size = 64 * 1024
+    default_error_messages = {
+        'invalid_base64': 'Некорректная строка base64.',
+        'too_large': 'Размер изображения превышает {max_size} байт.',
+        'unsupported_format': 'Формат изображения {format} не поддерживается.',
+        'too_big_dimensions': (
+            'Размеры изображения превышают {max_width}x{max_height}.'),
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            return super().to_internal_value(data)
+        if data.startswith('http'):
+            raise SkipField()
+        start = data.find(',') + 1 if data.startswith('data:') else 0
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        spool = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        image_format = None
+        header_checked = False
+        rest = ''
+        for offset in range(start, len(data), self.chunk_size):
+            # Переносы строк и пробелы допустимы, как и раньше; остаток
+            # некратной четырём части декодируется со следующей.
+            chunk = rest + ''.join(
+                data[offset:offset + self.chunk_size].split())
+            end = len(chunk) // 4 * 4
+            chunk, rest = chunk[:end], chunk[end:]
+            self.decode(spool, chunk)
+            if spool.tell() > max_size:
+                self.fail('too_large', max_size=max_size)
+            if not header_checked and spool.tell() >= self.header_size:
+                image_format = self.check_header(spool, complete=False)
+                header_checked = True
+        self.decode(spool, rest)
+        size = spool.tell()
+        IMAGE_UPLOAD_BYTES.observe(size)
+        if size > max_size:
+            self.fail('too_large', max_size=max_size)
+        if image_format is None:
+            image_format = self.check_header(spool, complete=True)
+        self.verify(spool)
+        uploaded = UploadedFile(
+            file=spool,
+            name=f'{uuid4()}.{image_format.lower()}',
+            content_type=Image.MIME.get(image_format),
+            size=size,
+        )
+        return serializers.FileField.to_internal_value(self, uploaded)
+
+    def decode(self, spool, chunk):
+        try:
+            spool.write(base64.b64decode(chunk, validate=True))
+        except (binascii.Error, ValueError):
+            self.fail('invalid_base64')
+
+    def check_header(self, spool, complete):
+        """Формат и размеры изображения по уже декодированному началу.
+
+        Если заголовок не помещается в начало (например, после большого
+        ICC-профиля), возвращает None, и проверка повторяется по всему
+        файлу.
+        """
+        position = spool.tell()
+        spool.seek(0)
+        try:
+            with Image.open(spool) as image:
+                image_format, (width, height) = image.format, image.size
+        except Exception:
+            if not complete:
+                spool.seek(position)
+                return None
+            self.fail('invalid_image')
+        if image_format not in settings.RECIPE_IMAGE_FORMATS:
+            self.fail('unsupported_format', format=image_format)
+        max_width, max_height = settings.RECIPE_IMAGE_MAX_DIMENSIONS
+        if width > max_width or height > max_height:
+            self.fail('too_big_dimensions',
+                      max_width=max_width, max_height=max_height)
+        spool.seek(position)
+        return image_format
+
+    def verify(self, spool):
+        spool.seek(0)
+        try:
+            with Image.open(spool) as image:
+                image.verify()
+        except Exception:
+            self.fail('invalid_image')
+        spool.seek(0)
+
+
+class RenditionField(serializers.ImageField):
+    """Обработанная копия изображения рецепта.
+
+    Пока фоновая обработка не завершена, отдаётся исходное изображение.
+    """
+
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return super().to_representation(
+            getattr(recipe, self.rendition) or recipe.image)
@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Case, Count, F, IntegerField, Value, When
 from django_filters.rest_framework import FilterSet, filters
 
 from .models import Ingredient, Recipe, Tag
+from .pantry import pantry_index
+from .search import search_recipes
 
 User = get_user_model()
 
@@ -14,6 +17,10 @@ class IngredientFilter(FilterSet):
         fields = ('name',)
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
 class RecipeFilter(FilterSet):
     author = filters.ModelChoiceFilter(
         label='Автор',
@@ -23,6 +30,22 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='filter_tags_mode',
+    )
+    search = filters.CharFilter(method='filter_search')
+    have = NumberInFilter(method='filter_have')
+    max_missing = filters.NumberFilter(method='filter_max_missing')
+    ordering = filters.ChoiceFilter(
+        choices=(
+            ('popular', 'Популярные'),
+            ('trending', 'Популярные за последнее время'),
+            ('cooking_time', 'Время приготовления'),
+        ),
+        method='filter_ordering',
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -30,7 +53,67 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'author', 'is_in_shopping_cart', 'tags')
+        fields = ('is_favorited', 'author', 'is_in_shopping_cart', 'tags',
+                  'tags_mode', 'search', 'have', 'max_missing', 'ordering')
+
+    def filter_tags(self, queryset, name, value):
+        """Полусоединение по таблице связи рецептов и тегов без дублей."""
+        if not value:
+            return queryset
+        tag_ids = {tag.id for tag in value}
+        recipe_tags = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+        if self.form.cleaned_data.get('tags_mode') == 'all':
+            recipe_tags = recipe_tags.values('recipe_id').annotate(
+                matched=Count('tag_id')).filter(matched=len(tag_ids))
+        return queryset.filter(id__in=recipe_tags.values('recipe_id'))
+
+    def filter_tags_mode(self, queryset, name, value):
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск, по умолчанию сортировка по релевантности.
+
+        Фильтр объявлен перед ordering, чтобы явная сортировка
+        применялась после него.
+        """
+        return search_recipes(queryset, value)
+
+    def filter_have(self, queryset, name, value):
+        """Рецепты из имеющихся ингредиентов по индексу в памяти.
+
+        Сначала рецепты, которым не хватает меньше ингредиентов.
+        """
+        if not value:
+            return queryset
+        max_missing = max(
+            int(self.form.cleaned_data.get('max_missing') or 0), 0)
+        groups = pantry_index.match(
+            [int(pk) for pk in value], max_missing)
+        if not groups:
+            return queryset.none()
+        return queryset.filter(
+            id__in=[pk for ids in groups.values() for pk in ids]
+        ).annotate(missing=Case(
+            *(When(id__in=ids, then=Value(count))
+              for count, ids in groups.items()),
+            output_field=IntegerField(),
+        )).order_by('missing', '-id')
+
+    def filter_max_missing(self, queryset, name, value):
+        return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        """Сортировка по рейтингу из RecipeRanking через аннотацию.
+
+        Аннотация нужна курсорной пагинации, чтобы прочитать позицию
+        из объекта; фильтр по рейтингу делает соединение внутренним.
+        """
+        if value == 'cooking_time':
+            return queryset.order_by('cooking_time', 'id')
+        field = 'popularity' if value == 'popular' else 'trending'
+        return queryset.filter(ranking__isnull=False).annotate(
+            **{field: F(f'ranking__{field}')}
+        ).order_by(f'-{field}', '-id')
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -0,0 +1,63 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .cache import bump_recipes
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+
+def schedule_renditions(recipe):
+    """Поставить обработку изображения в очередь после фиксации записи."""
+    transaction.on_commit(lambda: executor.submit(
+        make_renditions, recipe.pk, recipe.image.name))
+
+
+def render(image, size, image_format, quality):
+    rendition = image.copy()
+    rendition.thumbnail(size)
+    if image_format == 'JPEG' and rendition.mode not in ('RGB', 'L'):
+        rendition = rendition.convert('RGB')
+    buffer = BytesIO()
+    rendition.save(buffer, format=image_format, quality=quality,
+                   optimize=True)
+    return buffer.getvalue()
+
+
+def make_renditions(recipe_id, image_name):
+    """Уменьшенные копии изображения рецепта в форматах из настроек."""
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id, image=image_name).first()
+        if recipe is None:
+            return
+        base_name = os.path.splitext(os.path.basename(image_name))[0]
+        renditions = {}
+        with recipe.image.open('rb') as file, Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            for name, options in settings.RECIPE_IMAGE_RENDITIONS.items():
+                field = getattr(recipe, name)
+                content = render(image, options['size'], options['format'],
+                                 options['quality'])
+                field.save(f'{base_name}_{name}.{options["format"].lower()}',
+                           ContentFile(content), save=False)
+                renditions[name] = field.name
+        if Recipe.objects.filter(
+                pk=recipe_id, image=image_name).update(**renditions):
+            bump_recipes(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+    finally:
+        connections.close_all()
@@ -0,0 +1,200 @@
+import csv
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext,
+                               setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.counters import rebuild_recipe_counters, rebuild_user_counters
+from api.feed import rebuild_feeds
+from api.models import (FavoriteRecipe, Ingredient, IngredientRecipe, Recipe,
+                        ShoppingList, Tag)
+from api.pantry import pantry_index
+from api.rankings import refresh_rankings
+from api.search import update_search_vectors
+from users.models import Subscribe
+
+User = get_user_model()
+
+# Максимальное число SQL-запросов на один вызов эндпоинта.
+QUERY_BUDGETS = {
+    'recipes-list': 8,
+    'recipes-popular': 8,
+    'recipes-search': 8,
+    'recipes-have': 8,
+    'recipes-detail': 7,
+    'recipes-feed': 7,
+    'subscriptions': 4,
+    'download-shopping-cart': 2,
+    'ingredients-search': 2,
+}
+
+
+def fetch(client, url):
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, round(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Замер числа запросов, задержки и памяти эндпоинтов API '
+            'на тестовой базе данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--tags', type=int, default=5)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            client, recipe_id = self.populate(options)
+            failures = self.run_benchmarks(client, recipe_id, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if failures:
+            raise CommandError(
+                'Превышен бюджет запросов: ' + ', '.join(failures))
+
+    def populate(self, options):
+        User.objects.bulk_create(
+            User(username=f'bench{i}', email=f'bench{i}@example.com')
+            for i in range(options['users'])
+        )
+        users = list(User.objects.order_by('id'))
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', slug=f'tag{i}', color=f'#{i:06x}')
+            for i in range(options['tags'])
+        )
+        tags = list(Tag.objects.all())
+        path = Path(settings.BASE_DIR) / 'data' / 'ingredients.csv'
+        with open(path, encoding='utf-8') as file:
+            rows = [row for _, row in zip(range(options['ingredients']),
+                                          csv.reader(file))]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in rows
+        )
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {i}',
+                author=random.choice(users),
+                text='Описание рецепта.',
+                image='recipes/benchmark.png',
+                cooking_time=random.randint(1, 120),
+            ) for i in range(options['recipes'])
+        )
+        recipes = list(Recipe.objects.values_list('id', flat=True))
+        tag_through = Recipe.tags.through
+        tag_through.objects.bulk_create(
+            tag_through(recipe_id=recipe, tag_id=tag.id)
+            for recipe in recipes
+            for tag in random.sample(tags, min(2, len(tags)))
+        )
+        per_recipe = min(options['ingredients_per_recipe'], len(ingredients))
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe_id=recipe, ingredient_id=ingredient,
+                             amount=random.randint(1, 500))
+            for recipe in recipes
+            for ingredient in random.sample(ingredients, per_recipe)
+        )
+        reader, authors = users[0], users[1:]
+        FavoriteRecipe.objects.bulk_create(
+            FavoriteRecipe(user=reader, recipe_id=recipe)
+            for recipe in recipes[::3]
+        )
+        ShoppingList.objects.bulk_create(
+            ShoppingList(user=reader, recipe_id=recipe)
+            for recipe in recipes[::5]
+        )
+        Subscribe.objects.bulk_create(
+            Subscribe(user=reader, author=author) for author in authors
+        )
+        rebuild_recipe_counters()
+        rebuild_user_counters()
+        refresh_rankings(full=True)
+        rebuild_feeds()
+        update_search_vectors(Recipe.objects.all())
+        pantry_index.invalidate()
+        token = Token.objects.create(user=reader)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client, recipes[0]
+
+    def run_benchmarks(self, client, recipe_id, options):
+        page_size = options['page_size']
+        have = ','.join(str(pk) for pk in IngredientRecipe.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', flat=True))
+        endpoints = (
+            ('recipes-list', f'/api/recipes/?limit={page_size}'),
+            ('recipes-popular',
+             f'/api/recipes/?limit={page_size}&ordering=popular'),
+            ('recipes-search',
+             f'/api/recipes/?limit={page_size}&search=рецепт'),
+            ('recipes-have',
+             f'/api/recipes/?limit={page_size}&have={have}&max_missing=2'),
+            ('recipes-detail', f'/api/recipes/{recipe_id}/'),
+            ('recipes-feed', f'/api/recipes/feed/?limit={page_size}'),
+            ('subscriptions',
+             f'/api/users/subscriptions/?limit={page_size}'
+             '&recipes_limit=3'),
+            ('download-shopping-cart',
+             '/api/recipes/download_shopping_cart/'),
+            ('ingredients-search', '/api/ingredients/?name=а'),
+        )
+        failures = []
+        self.stdout.write(
+            f'{"endpoint":<24}{"queries":>8}{"budget":>8}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"peak, КиБ":>11}')
+        for name, url in endpoints:
+            with CaptureQueriesContext(connection) as context:
+                response = fetch(client, url)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{name}: {url} вернул {response.status_code}')
+            queries = len(context.captured_queries)
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                fetch(client, url)
+                timings.append((time.perf_counter() - start) * 1000)
+            tracemalloc.start()
+            fetch(client, url)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            budget = QUERY_BUDGETS[name]
+            line = (f'{name:<24}{queries:>8}{budget:>8}'
+                    f'{percentile(timings, 50):>10.2f}'
+                    f'{percentile(timings, 95):>10.2f}'
+                    f'{peak / 1024:>11.1f}')
+            if queries > budget:
+                failures.append(f'{name} ({queries} > {budget})')
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return failures
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = ('Сравнить время коротких запросов к базе с новым соединением '
+            'на каждый запрос и с постоянными соединениями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--max-age', type=int, default=60)
+        parser.add_argument(
+            '--host', help='Например, pgbouncer вместо db.')
+        parser.add_argument('--port')
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        for key in ('host', 'port'):
+            if options[key]:
+                settings_dict[key.upper()] = options[key]
+        self.stdout.write(
+            f'{settings_dict["ENGINE"]} {settings_dict["HOST"]}:'
+            f'{settings_dict["PORT"]}')
+        variants = (
+            ('conn_max_age=0', 0, False),
+            ('persistent', options['max_age'], False),
+            ('persistent+check', options['max_age'], True),
+        )
+        self.stdout.write(
+            f'{"variant":<20}{"connects":>10}{"p50, мс":>10}{"p95, мс":>10}')
+        for name, max_age, health_checks in variants:
+            connects, timings = self.measure(
+                max_age, health_checks, options['repeat'])
+            self.stdout.write(
+                f'{name:<20}{connects:>10}'
+                f'{timings[len(timings) // 2]:>10.2f}'
+                f'{timings[int(len(timings) * 0.95)]:>10.2f}')
+
+    def measure(self, max_age, health_checks, repeat):
+        """Циклы запроса Django с одним SQL-запросом внутри.
+
+        Сигналы начала и конца запроса закрывают соединение так же, как
+        обработчик Django, с учётом CONN_MAX_AGE.
+        """
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        connection.settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+        connects = []
+
+        def count(sender, **kwargs):
+            connects.append(sender)
+
+        connection_created.connect(count)
+        timings = []
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                request_finished.send(sender=self.__class__)
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection_created.disconnect(count)
+            connection.close()
+        return len(connects), sorted(timings)
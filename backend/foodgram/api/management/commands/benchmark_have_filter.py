@@ -0,0 +1,112 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, F, Q
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from api.models import Ingredient, IngredientRecipe, Recipe
+from api.pantry import PantrySnapshot
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнить поиск рецептов по имеющимся ингредиентам через '
+            'GROUP BY в базе и через индекс в памяти на тестовой базе '
+            'данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--have', type=int, default=30)
+        parser.add_argument('--max-missing', type=int, default=2)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            have = self.populate(options)
+            self.compare(have, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def populate(self, options):
+        # SQLite ограничивает размер пакета вставки сам.
+        batch_size = (options['batch_size']
+                      if connection.vendor == 'postgresql' else None)
+        author = User.objects.create(
+            username='bench', email='bench@example.com')
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+             for i in range(options['ingredients'])),
+            batch_size=batch_size
+        )
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        Recipe.objects.bulk_create(
+            (Recipe(name=f'Рецепт {i}', author=author, text='Описание.',
+                    image='recipes/benchmark.png', cooking_time=10)
+             for i in range(options['recipes'])),
+            batch_size=batch_size
+        )
+        # Популярные ингредиенты встречаются в рецептах чаще остальных.
+        weights = [1 / (rank + 1) for rank in range(len(ingredients))]
+        per_recipe = min(options['ingredients_per_recipe'], len(ingredients))
+        IngredientRecipe.objects.bulk_create(
+            (IngredientRecipe(recipe_id=recipe_id, ingredient_id=pk,
+                              amount=1)
+             for recipe_id in Recipe.objects.values_list('id', flat=True)
+             for pk in set(random.choices(
+                 ingredients, weights, k=per_recipe))),
+            batch_size=batch_size
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        return ingredients[:options['have']]
+
+    def measure(self, function, options):
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            result = function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return result, sorted(timings)[len(timings) // 2]
+
+    def group_by(self, have, options):
+        queryset = Recipe.objects.annotate(
+            matched=Count('ingredients', filter=Q(ingredients__in=have)),
+            total=Count('ingredients'),
+        ).filter(
+            matched__gt=0,
+            total__lte=F('matched') + options['max_missing'],
+        ).order_by()
+        return len(queryset.values_list('id', flat=True))
+
+    def compare(self, have, options):
+        start = time.perf_counter()
+        snapshot = PantrySnapshot.build()
+        build = (time.perf_counter() - start) * 1000
+        self.stdout.write(f'Построение индекса: {build:.0f} мс')
+        recipe_id = int(snapshot.recipe_ids[-1])
+        _, update = self.measure(
+            lambda: snapshot.with_recipe(recipe_id, set(have[:5])), options)
+        self.stdout.write(f'Обновление одного рецепта: {update:.2f} мс')
+        variants = (
+            ('group by', lambda: self.group_by(have, options)),
+            ('index', lambda: sum(len(ids) for ids in snapshot.match(
+                have, options['max_missing'], limit=None).values())),
+        )
+        self.stdout.write(f'{"variant":<20}{"rows":>10}{"мс":>12}')
+        for name, function in variants:
+            rows, timing = self.measure(function, options)
+            self.stdout.write(f'{name:<20}{rows:>10}{timing:>12.2f}')
@@ -0,0 +1,91 @@
+import base64
+import importlib.util
+import os
+import resource
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from api.fields import Base64ImageField
+
+
+def decode_streaming(data):
+    Base64ImageField().to_internal_value(data)
+
+
+def decode_drf_base64(data):
+    from drf_base64.fields import Base64ImageField as DRFBase64ImageField
+
+    DRFBase64ImageField().to_internal_value(data)
+
+
+VARIANTS = {
+    'streaming': decode_streaming,
+    'drf-base64': decode_drf_base64,
+}
+# Прежняя реализация больше не входит в зависимости проекта.
+OPTIONAL_MODULES = {
+    'drf-base64': 'drf_base64',
+}
+
+
+class Command(BaseCommand):
+    help = ('Замер пиковой памяти (RSS) при декодировании изображения '
+            'рецепта из base64.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=2000,
+                            help='ширина и высота изображения в пикселях')
+        parser.add_argument('--variants', nargs='+', default=list(VARIANTS),
+                            choices=list(VARIANTS))
+
+    def handle(self, *args, **options):
+        buffer = BytesIO()
+        size = options['size']
+        Image.frombytes(
+            'RGB', (size, size), os.urandom(size * size * 3)
+        ).save(buffer, format='PNG')
+        data = ('data:image/png;base64,'
+                + base64.b64encode(buffer.getvalue()).decode())
+        del buffer
+        self.stdout.write(f'Размер строки base64: {len(data) / 2**20:.1f} МиБ')
+        self.stdout.write(
+            f'{"variant":<14}{"RSS, МиБ":>12}{"python, МиБ":>14}'
+            f'{"время, мс":>12}')
+        for name in options['variants']:
+            module = OPTIONAL_MODULES.get(name)
+            if module and importlib.util.find_spec(module) is None:
+                self.stdout.write(
+                    f'{name:<14}пропущен: пакет {module} не установлен')
+                continue
+            self.stdout.write(self.measure(name, data))
+
+    def measure(self, name, data):
+        """Декодирование в дочернем процессе, чтобы RSS не смешивались."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                tracemalloc.start()
+                start = time.perf_counter()
+                VARIANTS[name](data)
+                elapsed = (time.perf_counter() - start) * 1000
+                _, peak = tracemalloc.get_traced_memory()
+                rss = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                       - baseline) / 1024
+                line = (f'{name:<14}{rss:>12.1f}{peak / 2**20:>14.1f}'
+                        f'{elapsed:>12.1f}')
+            except Exception as error:
+                line = f'{name:<14}ошибка: {error!r}'
+            os.write(write_fd, line.encode())
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            line = pipe.read()
+        os.waitpid(pid, 0)
+        return line
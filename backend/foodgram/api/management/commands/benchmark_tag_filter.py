@@ -0,0 +1,96 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from api.models import Recipe, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнить фильтрацию рецептов по тегам через JOIN + DISTINCT '
+            'и через полусоединение на тестовой базе данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--selected', type=int, default=3)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            tag_ids = self.populate(options)
+            self.compare(tag_ids, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def populate(self, options):
+        # SQLite ограничивает размер пакета вставки сам.
+        batch_size = (options['batch_size']
+                      if connection.vendor == 'postgresql' else None)
+        author = User.objects.create(
+            username='bench', email='bench@example.com')
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', slug=f'tag{i}', color=f'#{i:06x}')
+            for i in range(options['tags'])
+        )
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        Recipe.objects.bulk_create(
+            (Recipe(name=f'Рецепт {i}', author=author, text='Описание.',
+                    image='recipes/benchmark.png', cooking_time=10)
+             for i in range(options['recipes'])),
+            batch_size=batch_size
+        )
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            (through(recipe_id=recipe_id, tag_id=tag_id)
+             for recipe_id in Recipe.objects.values_list('id', flat=True)
+             for tag_id in random.sample(tag_ids, random.randint(1, 3))),
+            batch_size=batch_size
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        return tag_ids[:options['selected']]
+
+    def measure(self, queryset, options):
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            queryset.count()
+            list(queryset[:options['page_size']])
+            timings.append((time.perf_counter() - start) * 1000)
+        return sorted(timings)[len(timings) // 2]
+
+    def compare(self, tag_ids, options):
+        through = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+        variants = (
+            ('join', Recipe.objects.filter(tags__id__in=tag_ids)),
+            ('join + distinct',
+             Recipe.objects.filter(tags__id__in=tag_ids).distinct()),
+            ('semi-join (any)',
+             Recipe.objects.filter(id__in=through.values('recipe_id'))),
+            ('semi-join (all)', Recipe.objects.filter(
+                id__in=through.values('recipe_id').annotate(
+                    matched=Count('tag_id')
+                ).filter(matched=len(tag_ids)).values('recipe_id'))),
+        )
+        self.stdout.write(
+            f'{"variant":<20}{"rows":>10}{"count + page, мс":>20}')
+        for name, queryset in variants:
+            self.stdout.write(
+                f'{name:<20}{queryset.count():>10}'
+                f'{self.measure(queryset, options):>20.2f}')
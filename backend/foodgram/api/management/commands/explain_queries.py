@@ -0,0 +1,83 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from api.models import Ingredient, IngredientRecipe, Recipe, Tag
+from api.search import search_recipes
+from users.models import Subscribe
+
+User = get_user_model()
+
+SEQUENTIAL_SCAN = re.compile(r'Seq Scan on (\w+)|\bSCAN (?:TABLE )?(\w+)')
+
+
+class Command(BaseCommand):
+    help = ('Выполнить EXPLAIN для основных запросов API и вывести '
+            'последовательные сканирования таблиц.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='email пользователя, от имени которого '
+                           'строятся запросы')
+        parser.add_argument(
+            '--no-analyze', action='store_true',
+            help='не выполнять запросы (EXPLAIN без ANALYZE)')
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='выводить планы целиком')
+
+    def get_querysets(self, user):
+        tag = Tag.objects.first()
+        return {
+            'recipes-list': Recipe.objects.for_user(user)[:6],
+            'recipes-by-tag': Recipe.objects.filter(
+                tags__slug=tag.slug if tag else '')[:6],
+            'recipes-by-author': Recipe.objects.filter(author=user)[:6],
+            'recipes-favorited': Recipe.objects.filter(
+                favoriterecipe__user=user)[:6],
+            'recipes-in-cart': Recipe.objects.filter(
+                shoppinglist__user=user)[:6],
+            'shopping-cart-aggregate': IngredientRecipe.objects.filter(
+                recipe__shoppinglist__user=user
+            ).values(
+                'ingredient__name', 'ingredient__measurement_unit'
+            ).order_by('ingredient__name').annotate(count=Sum('amount')),
+            'subscriptions': Subscribe.objects.filter(
+                user=user).select_related('author').order_by('-id')[:6],
+            'subscribers': Subscribe.objects.filter(author=user),
+            'recipes-search': search_recipes(Recipe.objects.all(), 'соль')[:6],
+            'ingredients-prefix': Ingredient.objects.filter(
+                name__startswith='сол'),
+        }
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+        else:
+            user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+        analyze = (connection.vendor == 'postgresql'
+                   and not options['no_analyze'])
+        sequential = 0
+        for name, queryset in self.get_querysets(user).items():
+            plan = queryset.explain(analyze=analyze) if analyze else (
+                queryset.explain())
+            tables = sorted({
+                table for match in SEQUENTIAL_SCAN.finditer(plan)
+                for table in match.groups() if table
+            })
+            if tables:
+                sequential += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: последовательное сканирование '
+                    f'{", ".join(tables)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+        self.stdout.write(
+            f'Запросов с последовательным сканированием: {sequential}')
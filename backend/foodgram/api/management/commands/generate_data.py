@@ -0,0 +1,200 @@
+import os
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from api.cache import bump_all_recipes
+from api.counters import rebuild_recipe_counters, rebuild_user_counters
+from api.feed import rebuild_feeds
+from api.models import (FavoriteRecipe, Ingredient, IngredientRecipe, Recipe,
+                        ShoppingList, Tag)
+from api.rankings import refresh_rankings
+from api.search import update_search_vectors
+from users.models import Subscribe
+
+User = get_user_model()
+
+IMAGE_NAME = 'recipes/generated.jpg'
+
+
+def power_law_weights(count, alpha):
+    """Накопленные веса: вес i-го элемента равен 1 / (i + 1) ** alpha."""
+    return list(accumulate(1 / (rank + 1) ** alpha for rank in range(count)))
+
+
+def weighted_sample(population, cum_weights, k):
+    """Выборка без повторов, чаще попадают элементы с большим весом."""
+    k = min(k, len(population))
+    chosen = set()
+    while len(chosen) < k:
+        chosen.update(random.choices(
+            population, cum_weights=cum_weights, k=k - len(chosen)))
+    return chosen
+
+
+class Command(BaseCommand):
+    help = ('Наполнить базу синтетическими пользователями, подписками, '
+            'рецептами, избранным и списками покупок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='максимум подписок одного пользователя')
+        parser.add_argument('--favorites', type=int, default=30,
+                            help='максимум избранного одного пользователя')
+        parser.add_argument('--cart', type=int, default=5,
+                            help='максимум рецептов в списке покупок')
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='показатель степенного распределения популярности авторов '
+                 'и рецептов')
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='за сколько дней распределить избранное и списки покупок')
+        parser.add_argument('--prefix', default='load',
+                            help='префикс имён и email пользователей')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже есть, '
+                'укажите другой --prefix.')
+        if not Ingredient.objects.exists():
+            raise CommandError(
+                'Нет ингредиентов, сначала выполните load_ingredients.')
+        # SQLite ограничивает размер пакета вставки сам.
+        self.batch_size = (options['batch_size']
+                           if connection.vendor == 'postgresql' else None)
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = self.create_users(options)
+            self.create_subscriptions(users, options)
+            recipes = self.create_recipes(users, options)
+            self.create_lists(users, recipes, options)
+            # Массовые вставки не отправляют сигналы.
+            rebuild_recipe_counters()
+            rebuild_user_counters()
+            refresh_rankings(full=True)
+            rebuild_feeds()
+            update_search_vectors(Recipe.objects.all())
+            bump_all_recipes()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - start:.1f} с. Пароль '
+            f'пользователей {prefix}*@example.com: {options["password"]}'))
+
+    def bulk_create(self, model, objects, **kwargs):
+        model.objects.bulk_create(
+            objects, batch_size=self.batch_size, **kwargs)
+        self.stdout.write(f'{model.__name__}: {model.objects.count()}')
+
+    def create_users(self, options):
+        prefix = options['prefix']
+        password = make_password(options['password'])
+        self.bulk_create(User, (
+            User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com',
+                 first_name='Имя', last_name=f'Фамилия {i}',
+                 password=password)
+            for i in range(options['users'])
+        ))
+        users = list(User.objects.filter(
+            username__startswith=prefix).values_list('id', flat=True))
+        random.shuffle(users)
+        return users
+
+    def create_subscriptions(self, users, options):
+        weights = power_law_weights(len(users), options['alpha'])
+        subscriptions = []
+        for user in users:
+            follows = weighted_sample(
+                users, weights, random.randint(0, options['follows']))
+            follows.discard(user)
+            subscriptions.extend(
+                Subscribe(user_id=user, author_id=author)
+                for author in follows)
+        self.bulk_create(Subscribe, subscriptions)
+
+    def create_tags(self, options):
+        existing = Tag.objects.count()
+        self.bulk_create(Tag, (
+            Tag(name=f'Тег {i}', slug=f'tag-{i}', color=f'#{i:06x}')
+            for i in range(existing, options['tags'])
+        ), ignore_conflicts=True)
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def save_image(self):
+        if not default_storage.exists(IMAGE_NAME):
+            buffer = BytesIO()
+            Image.frombytes('RGB', (480, 480), os.urandom(480 * 480 * 3)).save(
+                buffer, format='JPEG', quality=75)
+            default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+        return IMAGE_NAME
+
+    def create_recipes(self, users, options):
+        prefix = options['prefix']
+        tags = self.create_tags(options)
+        image = self.save_image()
+        weights = power_law_weights(len(users), options['alpha'])
+        authors = random.choices(
+            users, cum_weights=weights, k=options['recipes'])
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        self.bulk_create(Recipe, (
+            Recipe(name=f'Рецепт {prefix}-{i}', author_id=author,
+                   image=image,
+                   text='Синтетический рецепт для нагрузочного '
+                        'тестирования.',
+                   cooking_time=random.randint(1, 180))
+            for i, author in enumerate(authors)
+        ))
+        recipes = list(Recipe.objects.filter(id__gt=last_id).values_list(
+            'id', flat=True))
+        through = Recipe.tags.through
+        self.bulk_create(through, (
+            through(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in random.sample(tags, random.randint(1, min(3, len(tags))))
+        ))
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        self.bulk_create(IngredientRecipe, (
+            IngredientRecipe(recipe_id=recipe, ingredient_id=ingredient,
+                             amount=random.randint(1, 500))
+            for recipe in recipes
+            for ingredient in random.sample(ingredients, random.randint(
+                1, min(options['ingredients_per_recipe'], len(ingredients))))
+        ))
+        return recipes
+
+    def create_lists(self, users, recipes, options):
+        recipes = random.sample(recipes, len(recipes))
+        weights = power_law_weights(len(recipes), options['alpha'])
+        now = timezone.now()
+        period = options['days'] * 24 * 60 * 60
+        for model, limit in ((FavoriteRecipe, options['favorites']),
+                             (ShoppingList, options['cart'])):
+            self.bulk_create(model, (
+                model(user_id=user, recipe_id=recipe, created=now - timedelta(
+                    seconds=random.uniform(0, period)))
+                for user in users
+                for recipe in weighted_sample(
+                    recipes, weights, random.randint(0, limit))
+            ))
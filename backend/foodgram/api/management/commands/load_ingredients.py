@@ -1,19 +1,184 @@
 import csv
+import io
+import json
+import os
+import re
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.autocomplete import ingredient_index
 from api.models import Ingredient
 
+HEADER = ('name', 'measurement_unit')
+WHITESPACE = re.compile(r'\s*')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) == 2 and tuple(row) != HEADER:
+            yield row[0].strip(), row[1].strip()
+
+
+def read_json_array(file, chunk_size=64 * 1024):
+    """Элементы массива JSON по одному, файл читается частями."""
+    decoder = json.JSONDecoder()
+    chunks = iter(lambda: file.read(chunk_size), '')
+    buffer, position = '', 0
+
+    def next_char():
+        nonlocal buffer, position
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            if position < len(buffer):
+                return buffer[position]
+            buffer, position = next(chunks, ''), 0
+            if not buffer:
+                raise ValueError('неожиданный конец массива JSON')
+
+    if next_char() != '[':
+        raise ValueError('ожидался массив JSON')
+    position += 1
+    if next_char() == ']':
+        return
+    while True:
+        next_char()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                error = None
+            except json.JSONDecodeError as decode_error:
+                end, error = len(buffer), decode_error
+            # Число на границе частей может быть обрезано, поэтому
+            # значение готово, только когда в буфере есть разделитель.
+            following = WHITESPACE.match(buffer, end).end()
+            if error is None and buffer[following:following + 1] in (
+                    ',', ']'):
+                break
+            chunk = next(chunks, '')
+            if not chunk:
+                if error is not None:
+                    raise error
+                break
+            buffer, position = buffer[position:] + chunk, 0
+        yield value
+        position = end
+        separator = next_char()
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(
+                f'неожиданный символ {separator!r} в массиве JSON')
+
+
+def read_json(file):
+    """Массив объектов JSON или JSON Lines (по объекту в строке).
+
+    Оба формата читаются потоком, без загрузки файла в память.
+    """
+    is_array = file.read(1024).lstrip().startswith('[')
+    file.seek(0)
+    if is_array:
+        rows = read_json_array(file)
+    else:
+        rows = (json.loads(line) for line in file if line.strip())
+    for row in rows:
+        yield row['name'].strip(), row['measurement_unit'].strip()
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
 
 class Command(BaseCommand):
-    help = "Import data from ingredients.csv"
+    help = 'Загрузить ингредиенты из файла csv или json'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='путь к файлу с ингредиентами')
+        parser.add_argument(
+            '--format', choices=list(READERS),
+            help='формат файла, по умолчанию определяется по расширению')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='не использовать COPY на PostgreSQL')
 
     def handle(self, *args, **options):
-        with open('data/ingredients.csv', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-            ingredients = [
-                Ingredient(name=name, measurement_unit=unit) for name,
-                unit in reader
-            ]
-            Ingredient.objects.bulk_create(ingredients)
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path)[1].lstrip('.').lower()
+        if file_format == 'jsonl':
+            file_format = 'json'
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        use_copy = (connection.vendor == 'postgresql'
+                    and not options['no_copy'])
+        start = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8') as file:
+                rows = READERS[file_format](file)
+                with transaction.atomic():
+                    if use_copy:
+                        total, inserted = self.copy(
+                            rows, options['batch_size'])
+                    else:
+                        total, inserted = self.bulk_create(
+                            rows, options['batch_size'])
+        except (OSError, KeyError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        ingredient_index.invalidate()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {inserted}, пропущено: {total - inserted}, '
+            f'{total / elapsed:.0f} строк/с'))
+
+    def bulk_create(self, rows, batch_size):
+        before = Ingredient.objects.count()
+        total = 0
+        for batch in batches(rows, batch_size):
+            total += len(batch)
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch),
+                ignore_conflicts=True,
+            )
+        return total, Ingredient.objects.count() - before
+
+    def copy(self, rows, batch_size):
+        """COPY во временную таблицу и вставка без конфликтующих строк."""
+        table = Ingredient._meta.db_table
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name varchar(200), measurement_unit varchar(50)) '
+                'ON COMMIT DROP')
+            for batch in batches(rows, batch_size):
+                total += len(batch)
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import FROM STDIN WITH CSV', buffer)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import ON CONFLICT DO NOTHING')
+            return total, cursor.rowcount
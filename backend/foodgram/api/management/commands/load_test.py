@@ -0,0 +1,198 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.benchmark_api import percentile
+
+
+class Client:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, token=None, data=None):
+        """Код ответа и тело, ошибки HTTP не считаются исключениями."""
+        headers = {'Accept': '*/*'}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        if data is not None:
+            data = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        request = Request(self.base_url + path, data=data, headers=headers,
+                          method=method)
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except HTTPError as error:
+            return error.code, error.read()
+
+    def get_json(self, path):
+        status, body = self.request('GET', path)
+        if status != 200:
+            raise CommandError(f'{path} вернул {status}')
+        return json.loads(body)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест запущенного сервера по сценарию: смесь '
+            'запросов к API, пропускная способность и перцентили задержки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument(
+            '--scenario',
+            default=os.path.join(
+                settings.BASE_DIR, 'data', 'loadtest_scenario.json'))
+        parser.add_argument('--duration', type=float, default=30,
+                            help='длительность теста в секундах')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--users', type=int, default=20,
+                            help='число пользователей, от имени которых '
+                                 'идут запросы')
+        parser.add_argument('--prefix', default='load',
+                            help='префикс email из generate_data')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output', help='сохранить результаты в json')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with open(options['scenario'], encoding='utf-8') as file:
+            scenario = json.load(file)
+        self.client = Client(options['base_url'], options['timeout'])
+        try:
+            self.tokens = self.login(options)
+            self.values = self.collect_values(scenario, options)
+        except URLError as error:
+            raise CommandError(
+                f'Сервер {options["base_url"]} недоступен: {error.reason}')
+        steps = scenario['steps']
+        self.results = {step['name']: [] for step in steps}
+        self.errors = {step['name']: 0 for step in steps}
+        self.lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            workers = [
+                executor.submit(self.worker, steps, deadline,
+                                random.Random(options['seed'] + number))
+                for number in range(options['concurrency'])
+            ]
+            for worker in workers:
+                worker.result()
+        self.report(time.perf_counter() - start, options)
+
+    def login(self, options):
+        tokens = []
+        for i in range(options['users']):
+            status, body = self.client.request(
+                'POST', '/api/auth/token/login/', data={
+                    'email': f'{options["prefix"]}{i}@example.com',
+                    'password': options['password'],
+                })
+            if status == 200:
+                tokens.append(json.loads(body)['auth_token'])
+        if not tokens:
+            raise CommandError(
+                'Не удалось войти ни одним пользователем, '
+                'сначала выполните generate_data.')
+        return tokens
+
+    def collect_values(self, scenario, options):
+        """Значения подстановок в пути запросов сценария."""
+        random.seed(options['seed'])
+        first = self.client.get_json('/api/recipes/?limit=20')
+        pages = max(1, math.ceil(first['count'] / 6))
+        recipes = list(first['results'])
+        for page in random.sample(range(1, math.ceil(pages / 3) + 1),
+                                  min(5, math.ceil(pages / 3))):
+            recipes += self.client.get_json(
+                f'/api/recipes/?limit=20&page={page}')['results']
+        if not recipes:
+            raise CommandError('Нет рецептов, сначала выполните '
+                               'generate_data.')
+        values = {
+            'recipe_id': [recipe['id'] for recipe in recipes],
+            'author_id': [recipe['author']['id'] for recipe in recipes],
+            'tag': [tag['slug'] for tag in self.client.get_json(
+                '/api/tags/')],
+            # Первые страницы открывают чаще, чем дальние.
+            'page': [max(1, min(pages, page)) for page in (
+                1, 1, 1, 2, 2, 3, 5, 10, pages // 2, pages)],
+        }
+        values.update(scenario.get('values', {}))
+        return values
+
+    def worker(self, steps, deadline, generator):
+        weights = [step.get('weight', 1) for step in steps]
+        while time.perf_counter() < deadline:
+            step = generator.choices(steps, weights)[0]
+            path = step['path'].format(**{
+                name: quote(str(generator.choice(values)))
+                for name, values in self.values.items()
+            })
+            token = (generator.choice(self.tokens) if step.get('auth')
+                     else None)
+            start = time.perf_counter()
+            try:
+                status, _ = self.client.request(
+                    step.get('method', 'GET'), path, token)
+            except (URLError, OSError):
+                status = None
+            elapsed = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.results[step['name']].append(elapsed)
+                if status not in step.get('expect', [200]):
+                    self.errors[step['name']] += 1
+
+    def report(self, elapsed, options):
+        total = sum(len(timings) for timings in self.results.values())
+        self.stdout.write(
+            f'{"step":<24}{"count":>8}{"errors":>8}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"p99, мс":>10}')
+        summary = {}
+        rows = list(self.results.items()) + [
+            ('total', [t for timings in self.results.values()
+                       for t in timings])]
+        for name, timings in rows:
+            if not timings:
+                continue
+            errors = (sum(self.errors.values()) if name == 'total'
+                      else self.errors[name])
+            summary[name] = {
+                'count': len(timings),
+                'errors': errors,
+                'p50': percentile(timings, 50),
+                'p95': percentile(timings, 95),
+                'p99': percentile(timings, 99),
+            }
+            line = (f'{name:<24}{len(timings):>8}{errors:>8}'
+                    f'{summary[name]["p50"]:>10.1f}'
+                    f'{summary[name]["p95"]:>10.1f}'
+                    f'{summary[name]["p99"]:>10.1f}')
+            self.stdout.write(
+                self.style.ERROR(line) if errors else line)
+        throughput = total / elapsed
+        self.stdout.write(self.style.SUCCESS(
+            f'Запросов: {total} за {elapsed:.1f} с, '
+            f'{throughput:.1f} запросов/с, '
+            f'параллельность {options["concurrency"]}'))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'base_url': options['base_url'],
+                    'duration': elapsed,
+                    'concurrency': options['concurrency'],
+                    'throughput': throughput,
+                    'steps': summary,
+                }, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.counters import rebuild_recipe_counters, rebuild_user_counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитать счётчики избранного, списков покупок, рецептов '
+            'и подписчиков.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = rebuild_recipe_counters()
+            users = rebuild_user_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено рецептов: {recipes}, пользователей: {users}'))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Заново заполнить ленты подписок по текущим подпискам.'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            count = rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано строк лент: {count} '
+            f'за {time.perf_counter() - start:.1f} с'))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Recipe
+from api.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать поисковые данные всех рецептов.'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            count = update_search_vectors(Recipe.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {count} '
+            f'за {time.perf_counter() - start:.1f} с'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+
+from api.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = ('Пересчитать популярность и тренды рецептов. С --interval '
+            'команда повторяет пересчёт периодически.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int,
+            help='повторять каждые N секунд')
+        parser.add_argument(
+            '--full', action='store_true',
+            help='пересчитать тренды по всем действиям окна')
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            with transaction.atomic():
+                popularity, trending = refresh_rankings(
+                    full=options['full'])
+            self.stdout.write(
+                f'Обновлено популярность: {popularity}, тренды: {trending} '
+                f'за {time.perf_counter() - start:.2f} с')
+            if not options['interval']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
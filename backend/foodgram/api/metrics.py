@@ -0,0 +1,135 @@
+import os
+import time
+from functools import wraps
+
+from django.db import connection
+from prometheus_client import (REGISTRY, CollectorRegistry, Counter,
+                               Histogram, generate_latest, multiprocess)
+
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса представлением.',
+    ['route', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'foodgram_db_queries',
+    'Число SQL-запросов на запрос.',
+    ['route'],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, float('inf')),
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests',
+    'Обращения к кешу: попадания и промахи.',
+    ['cache', 'result'],
+)
+IMAGE_UPLOAD_BYTES = Histogram(
+    'foodgram_image_upload_bytes',
+    'Размер загруженных изображений рецептов.',
+    buckets=tuple(2 ** power * 1024 for power in range(5, 16, 2))
+    + (float('inf'),),
+)
+SHOPPING_CART_EXPORT_DURATION = Histogram(
+    'foodgram_shopping_cart_export_seconds',
+    'Время выгрузки списка покупок.',
+    ['format', 'cached'],
+)
+
+
+def registry():
+    """Реестр метрик для выдачи.
+
+    В режиме нескольких процессов метрики собираются из файлов всех
+    воркеров в PROMETHEUS_MULTIPROC_DIR.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def export():
+    return generate_latest(registry())
+
+
+def cache_result(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def timed_export(chunks, file_format, cached):
+    """Отдать части файла, замерив время выгрузки до последней части."""
+    start = time.perf_counter()
+    yield from chunks
+    SHOPPING_CART_EXPORT_DURATION.labels(file_format, cached).observe(
+        time.perf_counter() - start)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def observe_duration(route, request, response, start):
+    """Записать время ответа.
+
+    Ответы DRF рендерятся после выхода из представления, поэтому время
+    записывается после рендеринга.
+    """
+
+    def observe(response):
+        REQUEST_DURATION.labels(
+            route, request.method, response.status_code
+        ).observe(time.perf_counter() - start)
+
+    if hasattr(response, 'add_post_render_callback'):
+        response.add_post_render_callback(observe)
+    else:
+        observe(response)
+
+
+def async_route(routes):
+    """Время ответа асинхронного представления по имени маршрута.
+
+    routes сопоставляет методам HTTP имена маршрутов; запросы других
+    методов передаются синхронным представлениям, и их время
+    записывает MetricsMixin.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            route = routes.get(request.method)
+            if route is None:
+                return await view(request, *args, **kwargs)
+            start = time.perf_counter()
+            request.async_route = route
+            response = await view(request, *args, **kwargs)
+            observe_duration(route, request, response, start)
+            return response
+        return wrapper
+    return decorator
+
+
+class MetricsMixin:
+    """Время ответа и число SQL-запросов представления DRF в метриках.
+
+    Маршрут — имя представления и действия, например RecipeViewSet.list.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        start = time.perf_counter()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = super().dispatch(request, *args, **kwargs)
+        action = getattr(self, 'action', None) or request.method.lower()
+        route = f'{type(self).__name__}.{action}'
+        DB_QUERIES.labels(route).observe(queries.count)
+        # Время запроса, начатого в асинхронном представлении,
+        # записывает оно само.
+        if not hasattr(request, 'async_route'):
+            observe_duration(route, request, response, start)
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_add_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='preview',
+            field=models.ImageField(blank=True, upload_to='recipes/renditions/', verbose_name='Сжатое изображение'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='recipes/renditions/', verbose_name='Миниатюра изображения'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    FeedItem = apps.get_model('api', 'FeedItem')
+    Recipe = apps.get_model('api', 'Recipe')
+    Subscribe = apps.get_model('users', 'Subscribe')
+    recipes = {}
+    items = []
+    for user_id, author_id in Subscribe.objects.exclude(
+        author__counters__followers_count__gt=(
+            settings.FEED_FANOUT_MAX_FOLLOWERS)
+    ).values_list('user_id', 'author_id').iterator():
+        if author_id not in recipes:
+            recipes[author_id] = list(Recipe.objects.filter(
+                author_id=author_id).order_by('-id').values_list(
+                    'id', flat=True)[:settings.FEED_BACKFILL])
+        items.extend(
+            FeedItem(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+            for recipe_id in recipes[author_id])
+    FeedItem.objects.bulk_create(items)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0005_recipe_rankings'),
+        ('users', '0003_usercounters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор рецепта')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='api.Recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в ленте',
+                'verbose_name_plural': 'Ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', 'author'], name='feed_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='feed_user_recipe_unique'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
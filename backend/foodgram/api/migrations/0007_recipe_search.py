@@ -0,0 +1,69 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:39
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRES_INDEX = (
+    'CREATE INDEX recipe_search_vector_idx ON api_recipe '
+    'USING GIN (search_vector)'
+)
+POSTGRES_POPULATE = """
+    UPDATE api_recipe SET search_vector =
+        setweight(to_tsvector('russian', name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(i.name, ' ')
+            FROM api_ingredientrecipe ri
+            JOIN api_ingredient i ON i.id = ri.ingredient_id
+            WHERE ri.recipe_id = api_recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', text), 'C')
+"""
+SQLITE_TABLE = (
+    'CREATE VIRTUAL TABLE api_recipe_search '
+    'USING fts5(name, text, ingredients)'
+)
+SQLITE_POPULATE = """
+    INSERT INTO api_recipe_search (rowid, name, text, ingredients)
+    SELECT r.id, r.name, r.text, (
+        SELECT group_concat(i.name, ' ')
+        FROM api_ingredientrecipe ri
+        JOIN api_ingredient i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id
+    )
+    FROM api_recipe r
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-индекс на PostgreSQL, таблица FTS5 на SQLite."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_INDEX)
+        schema_editor.execute(POSTGRES_POPULATE)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_TABLE)
+        schema_editor.execute(SQLITE_POPULATE)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX recipe_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE api_recipe_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_feed_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
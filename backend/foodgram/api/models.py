@@ -1,6 +1,12 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.utils import timezone
+
+from users.models import Subscribe
 
 User = get_user_model()
 
@@ -25,6 +31,12 @@ class Ingredient(models.Model):
                 fields=('name', 'measurement_unit'),
                 name='unique_fields'),
         )
+        indexes = (
+            models.Index(
+                fields=('name',),
+                name='ingredient_name_pattern_idx',
+                opclasses=('varchar_pattern_ops',)),
+        )
         ordering = ['-id']
         verbose_name = 'Ингридиент.'
 
@@ -61,6 +73,43 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def for_user(self, user):
+        """Рецепты со связанными данными и флагами текущего пользователя."""
+        queryset = self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientrecipe',
+                queryset=IngredientRecipe.objects.select_related('ingredient')
+            ),
+        )
+        if user is None or user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+    def newest_per_author(self, limit):
+        """Не более limit последних рецептов каждого автора.
+
+        Последние рецепты автора выбираются коррелированным подзапросом
+        по индексу recipe_author_id_idx.
+        """
+        newest = self.order_by().filter(
+            author=OuterRef('author')).order_by('-id').values('id')[:limit]
+        return self.filter(id__in=Subquery(newest))
+
+
 class Recipe(models.Model):
     name = models.CharField(
         max_length=200,
@@ -87,6 +136,16 @@ class Recipe(models.Model):
         upload_to='recipes/',
         blank=False
     )
+    thumbnail = models.ImageField(
+        verbose_name='Миниатюра изображения',
+        upload_to='recipes/renditions/',
+        blank=True
+    )
+    preview = models.ImageField(
+        verbose_name='Сжатое изображение',
+        upload_to='recipes/renditions/',
+        blank=True
+    )
     tags = models.ManyToManyField(
         Tag,
         verbose_name='Тег',
@@ -95,8 +154,37 @@ class Recipe(models.Model):
         verbose_name="Время приготовления",
         validators=[MinValueValidator(1, message="Минимальное значение 1.")],
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    computed_fields = ('favorites_count', 'in_carts_count', 'search_vector')
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_author_id_idx'
+            ),
+            models.Index(
+                fields=['cooking_time', 'id'],
+                name='recipe_cooking_time_idx'
+            ),
+        ]
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
@@ -104,6 +192,17 @@ class Recipe(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Счётчики и поисковый вектор обновляются запросами из сигналов,
+        # сохранение рецепта не должно затирать их устаревшими значениями.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.computed_fields
+            ]
+        super().save(*args, **kwargs)
+
 
 class IngredientRecipe(models.Model):
     recipe = models.ForeignKey(
@@ -138,6 +237,12 @@ class IngredientRecipe(models.Model):
                 name='recipe_ingredient'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'ingredient', 'amount'],
+                name='ingredientrecipe_cover_idx'
+            ),
+        ]
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецепте'
 
@@ -157,6 +262,11 @@ class FavoriteRecipe(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Пользователь'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        default=timezone.now,
+        db_index=True
+    )
 
     class Meta:
         constraints = [
@@ -165,6 +275,12 @@ class FavoriteRecipe(models.Model):
                 name='Selected_unique'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx'
+            ),
+        ]
         ordering = ['-id']
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
@@ -184,6 +300,11 @@ class ShoppingList(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        default=timezone.now,
+        db_index=True
+    )
 
     class Meta:
         constraints = (
@@ -192,9 +313,92 @@ class ShoppingList(models.Model):
                 name='shopping_recipe_user_exists',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('user', 'recipe'),
+                name='shopping_user_recipe_idx',
+            ),
+        )
         ordering = ('-id',)
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
 
     def __str__(self):
         return f'Рецепт {self.recipe} у пользователя {self.user}'
+
+
+class RecipeRanking(models.Model):
+    """Рейтинги рецепта, пересчитываются командой refresh_rankings."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking',
+        verbose_name='Рецепт'
+    )
+    popularity = models.PositiveIntegerField(
+        'Популярность',
+        default=0
+    )
+    trending = models.FloatField(
+        'Популярность за последнее время',
+        default=0
+    )
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('-popularity', '-recipe'),
+                name='ranking_popularity_idx',
+            ),
+            models.Index(
+                fields=('-trending', '-recipe'),
+                name='ranking_trending_idx',
+            ),
+        )
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popularity}, {self.trending:.2f}'
+
+
+class FeedItem(models.Model):
+    """Рецепт в ленте подписчика, записывается при публикации рецепта."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='feed_user_recipe_unique',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx',
+            ),
+        )
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Ленты подписок'
+
+    def __str__(self):
+        return f'Рецепт {self.recipe} в ленте пользователя {self.user}'
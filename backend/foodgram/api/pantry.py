@@ -0,0 +1,136 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import IngredientRecipe
+
+
+class PantrySnapshot:
+    """Инвертированный индекс: ингредиент -> позиции рецептов.
+
+    recipe_ids — отсортированные id рецептов, counts — число
+    ингредиентов в каждом из них, postings — отсортированные массивы
+    позиций рецептов в recipe_ids для каждого ингредиента.
+    """
+
+    def __init__(self, recipe_ids, counts, postings, built_at=None):
+        self.built_at = built_at or time.monotonic()
+        self.recipe_ids = recipe_ids
+        self.counts = counts
+        self.postings = postings
+
+    @classmethod
+    def build(cls):
+        rows = np.array(
+            IngredientRecipe.objects.values_list(
+                'ingredient_id', 'recipe_id').order_by(),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        recipe_ids, positions = np.unique(rows[:, 1], return_inverse=True)
+        counts = np.bincount(positions, minlength=len(recipe_ids))
+        order = np.lexsort((positions, rows[:, 0]))
+        ingredients, positions = rows[order, 0], positions[order]
+        keys, starts = np.unique(ingredients, return_index=True)
+        postings = dict(zip(
+            keys.tolist(), np.split(positions, starts[1:])))
+        return cls(recipe_ids, counts, postings)
+
+    def match(self, ingredient_ids, max_missing, limit):
+        """id рецептов, которым не хватает не больше max_missing.
+
+        Возвращает словарь {число недостающих: [id рецептов]} для лучших
+        limit рецептов: меньше недостающих, затем новее.
+        """
+        lists = [self.postings[pk] for pk in set(ingredient_ids)
+                 if pk in self.postings]
+        if not lists:
+            return {}
+        matched = np.bincount(
+            np.concatenate(lists), minlength=len(self.recipe_ids))
+        missing = self.counts - matched
+        found = np.flatnonzero((matched > 0) & (missing <= max_missing))
+        best = found[np.lexsort((-self.recipe_ids[found],
+                                 missing[found]))][:limit]
+        groups = {}
+        for position in best.tolist():
+            groups.setdefault(int(missing[position]), []).append(
+                int(self.recipe_ids[position]))
+        return groups
+
+    def with_recipe(self, recipe_id, ingredient_ids):
+        """Копия индекса с новым составом одного рецепта или None.
+
+        None означает, что точечное обновление невозможно и индекс
+        нужно построить заново.
+        """
+        recipe_ids, counts = self.recipe_ids, self.counts
+        position = int(np.searchsorted(recipe_ids, recipe_id))
+        if position == len(recipe_ids) or recipe_ids[position] != recipe_id:
+            if not ingredient_ids:
+                return self
+            if position != len(recipe_ids):
+                return None
+            recipe_ids = np.append(recipe_ids, recipe_id)
+            counts = np.append(counts, 0)
+        else:
+            counts = counts.copy()
+        counts[position] = len(ingredient_ids)
+        postings = dict(self.postings)
+        for pk, posting in self.postings.items():
+            index = np.searchsorted(posting, position)
+            found = index < len(posting) and posting[index] == position
+            if found and pk not in ingredient_ids:
+                postings[pk] = np.delete(posting, index)
+        for pk in ingredient_ids:
+            posting = postings.get(pk, np.empty(0, dtype=np.int64))
+            index = np.searchsorted(posting, position)
+            if index == len(posting) or posting[index] != position:
+                postings[pk] = np.insert(posting, index, position)
+        return PantrySnapshot(recipe_ids, counts, postings, self.built_at)
+
+
+class PantryIndex:
+    """Индекс для поиска рецептов по имеющимся ингредиентам.
+
+    Строится при первом обращении, обновляется точечно после изменения
+    состава рецепта и перестраивается не реже PANTRY_INDEX_TTL секунд,
+    чтобы изменения, сделанные в других процессах, тоже попадали
+    в выдачу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        ttl = settings.PANTRY_INDEX_TTL
+        if snapshot is None or time.monotonic() - snapshot.built_at > ttl:
+            with self._lock:
+                if self._snapshot is snapshot:
+                    self._snapshot = PantrySnapshot.build()
+                snapshot = self._snapshot
+        return snapshot
+
+    def update_recipe(self, recipe_id):
+        """Перечитать состав рецепта из базы и обновить индекс."""
+        if self._snapshot is None:
+            return
+        ingredient_ids = set(IngredientRecipe.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', flat=True))
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot = self._snapshot.with_recipe(
+                    recipe_id, ingredient_ids)
+
+    def match(self, ingredient_ids, max_missing):
+        return self._get_snapshot().match(
+            ingredient_ids, max_missing, settings.PANTRY_MAX_RESULTS)
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,203 @@
+import logging
+import random
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .cache import bump_version, get_version
+
+logger = logging.getLogger(__name__)
+
+PROFILING_VERSION = 'profiling_version'
+METRICS = ('requests', 'queries', 'db_us', 'app_us', 'serialize_us',
+           'total_us', 'bytes', 'n_plus_one')
+
+
+def sql_shape(sql):
+    """SQL без значений: запросы, отличающиеся параметрами, совпадают."""
+    sql = re.sub(r'%s(\s*,\s*%s)*', '?', sql)
+    return re.sub(r'\b\d+\b', '?', sql)
+
+
+def view_name(view_func, method):
+    """Имя представления DRF и действия, например RecipeViewSet.list."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return None
+    method = method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class RequestProfile:
+    """Замеры одного запроса; вызывается как обёртка выполнения SQL."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view = None
+        self.view_start = None
+        self.render_start = None
+        self.render_end = None
+        self.end = None
+        self.db_time = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.shapes[sql_shape(sql)] += 1
+
+    def rendered(self, response):
+        self.render_end = time.perf_counter()
+
+    def timings(self):
+        """Время в секундах: база, код представления, рендеринг, всего."""
+        view_end = self.render_start or self.end
+        serialize = 0
+        if self.render_start and self.render_end:
+            serialize = self.render_end - self.render_start
+        app = max(view_end - self.view_start - self.db_time, 0)
+        return self.db_time, app, serialize, self.end - self.start
+
+    def suspects(self):
+        """Одинаковые по форме запросы, повторённые много раз, — N+1."""
+        threshold = settings.PROFILING_N_PLUS_ONE_THRESHOLD
+        return [(shape, count) for shape, count in
+                self.shapes.most_common() if count >= threshold]
+
+    def server_timing(self):
+        db, app, serialize, total = self.timings()
+        queries = sum(self.shapes.values())
+        return (f'db;dur={db * 1000:.2f};desc="{queries} queries", '
+                f'app;dur={app * 1000:.2f}, '
+                f'serialize;dur={serialize * 1000:.2f}, '
+                f'total;dur={total * 1000:.2f}')
+
+
+def metric_key(version, view, metric):
+    return f'profiling:{version}:{view}:{metric}'
+
+
+def increment(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, settings.PROFILING_STATS_TIMEOUT)
+        cache.incr(key, delta)
+
+
+def record(profile, response):
+    """Добавить замеры запроса в общую статистику в кеше.
+
+    Статистика общая для всех процессов, поэтому хранится в кеше,
+    а не в памяти.
+    """
+    version = get_version(PROFILING_VERSION)
+    views_key = f'profiling:{version}:views'
+    views = cache.get(views_key) or set()
+    if profile.view not in views:
+        cache.set(views_key, views | {profile.view},
+                  settings.PROFILING_STATS_TIMEOUT)
+    db, app, serialize, total = profile.timings()
+    suspects = profile.suspects()
+    values = {
+        'requests': 1,
+        'queries': sum(profile.shapes.values()),
+        'db_us': int(db * 1e6),
+        'app_us': int(app * 1e6),
+        'serialize_us': int(serialize * 1e6),
+        'total_us': int(total * 1e6),
+        'bytes': 0 if response.streaming else len(response.content),
+        'n_plus_one': int(bool(suspects)),
+    }
+    for metric, value in values.items():
+        increment(metric_key(version, profile.view, metric), value)
+    if suspects:
+        shape, count = suspects[0]
+        logger.warning('Возможный N+1 в %s: %s запросов %s',
+                       profile.view, count, shape)
+        cache.set(metric_key(version, profile.view, 'suspect'),
+                  {'sql': shape, 'count': count},
+                  settings.PROFILING_STATS_TIMEOUT)
+
+
+def average_ms(total_us, requests):
+    return round(total_us / requests / 1000, 2)
+
+
+def get_stats():
+    """Средние значения по представлениям, сначала самые медленные."""
+    version = get_version(PROFILING_VERSION)
+    views = cache.get(f'profiling:{version}:views') or set()
+    stats = []
+    for view in views:
+        values = cache.get_many(
+            [metric_key(version, view, metric)
+             for metric in METRICS + ('suspect',)])
+        values = {key.rsplit(':', 1)[1]: value
+                  for key, value in values.items()}
+        requests = values.get('requests')
+        if not requests:
+            continue
+        stats.append({
+            'view': view,
+            'requests': requests,
+            'queries': round(values.get('queries', 0) / requests, 1),
+            'db_ms': average_ms(values.get('db_us', 0), requests),
+            'app_ms': average_ms(values.get('app_us', 0), requests),
+            'serialize_ms': average_ms(
+                values.get('serialize_us', 0), requests),
+            'total_ms': average_ms(values.get('total_us', 0), requests),
+            'bytes': values.get('bytes', 0) // requests,
+            'n_plus_one': values.get('n_plus_one', 0),
+            'suspect': values.get('suspect'),
+        })
+    return sorted(stats, key=lambda row: row['total_ms'], reverse=True)
+
+
+def reset_stats():
+    bump_version(PROFILING_VERSION)
+
+
+class QueryProfilingMiddleware:
+    """Профилирование доли запросов к представлениям DRF.
+
+    Для PROFILING_SAMPLE_RATE запросов считает SQL-запросы и время базы,
+    кода представления и рендеринга, ищет повторяющиеся запросы,
+    добавляет заголовок Server-Timing и копит статистику в кеше.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = request.profile = RequestProfile()
+        with connection.execute_wrapper(profile):
+            response = self.get_response(request)
+        profile.end = time.perf_counter()
+        if profile.view is not None:
+            record(profile, response)
+            response['Server-Timing'] = profile.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, 'profile', None)
+        if profile is not None:
+            profile.view = view_name(view_func, request.method)
+            profile.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        profile = getattr(request, 'profile', None)
+        if profile is not None:
+            profile.render_start = time.perf_counter()
+            response.add_post_render_callback(profile.rendered)
+        return response
@@ -0,0 +1,137 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import RECIPES_LIST_VERSION, bump_version
+from .models import FavoriteRecipe, Recipe, RecipeRanking, ShoppingList
+
+BATCH_SIZE = 1000
+TRENDING_STATE = 'rankings:trending'
+
+
+def activity_weights():
+    return (
+        (FavoriteRecipe, settings.RANKING_FAVORITE_WEIGHT),
+        (ShoppingList, settings.RANKING_CART_WEIGHT),
+    )
+
+
+def create_missing_rankings():
+    RecipeRanking.objects.bulk_create(
+        (RecipeRanking(recipe_id=recipe_id) for recipe_id in
+         Recipe.objects.filter(ranking__isnull=True).values_list(
+             'pk', flat=True)),
+        ignore_conflicts=True,
+    )
+
+
+def refresh_popularity():
+    """Обновить популярность там, где разошлась со счётчиками рецепта."""
+    changed = RecipeRanking.objects.annotate(
+        score=(F('recipe__favorites_count') * settings.RANKING_FAVORITE_WEIGHT
+               + F('recipe__in_carts_count') * settings.RANKING_CART_WEIGHT)
+    ).exclude(popularity=F('score')).values_list('recipe_id', 'score')
+    rankings = [RecipeRanking(recipe_id=recipe_id, popularity=score)
+                for recipe_id, score in changed.iterator()]
+    RecipeRanking.objects.bulk_update(
+        rankings, ['popularity'], batch_size=BATCH_SIZE)
+    return len(rankings)
+
+
+def event_scores(epoch, **lookups):
+    """Суммы весов действий по рецептам с прямым затуханием.
+
+    Вес действия растёт вдвое за период от epoch: порядок рецептов тот
+    же, что у весов, затухающих вдвое за период от текущего момента,
+    но сохранённые счёты не нужно уменьшать при каждом обновлении.
+    """
+    half_life = settings.RANKING_TRENDING_HALF_LIFE
+    scores = defaultdict(float)
+    for model, weight in activity_weights():
+        events = model.objects.filter(**lookups).values_list(
+            'recipe_id', 'created')
+        for recipe_id, created in events.iterator():
+            age = (epoch - created).total_seconds()
+            scores[recipe_id] += weight * 0.5 ** (age / half_life)
+    return scores
+
+
+def rebuild_trending(now):
+    """Пересчитать тренды по всем действиям окна с новым epoch."""
+    since = now - timedelta(seconds=settings.RANKING_TRENDING_WINDOW)
+    scores = event_scores(now, created__gte=since, created__lte=now)
+    # Рецепты, у которых все действия вышли за окно, обнуляются.
+    stale = set(RecipeRanking.objects.filter(trending__gt=0).values_list(
+        'recipe_id', flat=True)) - scores.keys()
+    rankings = [RecipeRanking(recipe_id=recipe_id, trending=score)
+                for recipe_id, score in scores.items()]
+    rankings += [RecipeRanking(recipe_id=recipe_id, trending=0)
+                 for recipe_id in stale]
+    RecipeRanking.objects.bulk_update(
+        rankings, ['trending'], batch_size=BATCH_SIZE)
+    return len(rankings)
+
+
+def update_trending(now, epoch, refreshed):
+    """Добавить действия после прошлого обновления, вычесть вышедшие из окна.
+
+    Удалённые действия и действия, зафиксированные позже момента
+    обновления, учитывает только полный пересчёт.
+    """
+    window = timedelta(seconds=settings.RANKING_TRENDING_WINDOW)
+    deltas = event_scores(epoch, created__gt=refreshed, created__lte=now)
+    expired = event_scores(
+        epoch, created__gte=refreshed - window, created__lt=now - window)
+    for recipe_id, score in expired.items():
+        deltas[recipe_id] -= score
+    rankings = [
+        RecipeRanking(recipe_id=recipe_id, trending=F('trending') + delta)
+        for recipe_id, delta in deltas.items()
+    ]
+    RecipeRanking.objects.bulk_update(
+        rankings, ['trending'], batch_size=BATCH_SIZE)
+    # Остаток от вычитания меньше веса любого действия в окне.
+    threshold = min(weight for _, weight in activity_weights()) * 0.5 ** (
+        (epoch - (now - window)).total_seconds()
+        / settings.RANKING_TRENDING_HALF_LIFE) / 2
+    zeroed = RecipeRanking.objects.exclude(trending=0).filter(
+        trending__lt=threshold).update(trending=0)
+    return len(rankings) + zeroed
+
+
+def refresh_trending(now=None, full=False):
+    """Обновить тренды с прошлого обновления.
+
+    Момент прошлого обновления и epoch хранятся в кеше. Без них, по
+    флагу full и раз в RANKING_TRENDING_REBUILD_INTERVAL тренды
+    пересчитываются полностью, и epoch сдвигается к текущему моменту.
+    """
+    now = now or timezone.now()
+    state = None if full else cache.get(TRENDING_STATE)
+    rebuild_interval = timedelta(
+        seconds=settings.RANKING_TRENDING_REBUILD_INTERVAL)
+    if (state is None or not state[0] <= state[1] <= now
+            or now - state[0] >= rebuild_interval):
+        epoch = now
+        count = rebuild_trending(now)
+    else:
+        epoch = state[0]
+        count = update_trending(now, *state)
+    transaction.on_commit(
+        lambda: cache.set(TRENDING_STATE, (epoch, now), None))
+    return count
+
+
+def refresh_rankings(full=False):
+    """Пересчитать рейтинги, вернуть число изменённых строк."""
+    create_missing_rankings()
+    popularity = refresh_popularity()
+    trending = refresh_trending(full=full)
+    if popularity or trending:
+        bump_version(RECIPES_LIST_VERSION)
+    return popularity, trending
@@ -0,0 +1,114 @@
+import re
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import (Aggregate, F, FloatField, OuterRef, Q, Subquery,
+                              TextField, Value)
+from django.db.models.expressions import RawSQL
+
+from .models import Ingredient, IngredientRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+# Таблица FTS5 для поиска на SQLite, столбцы: name, text, ingredients.
+FTS_TABLE = 'api_recipe_search'
+FTS_WEIGHTS = (10.0, 1.0, 5.0)
+BATCH_SIZE = 500
+
+
+def ingredient_names():
+    """Названия ингредиентов рецепта одной строкой."""
+    return Subquery(
+        IngredientRecipe.objects.filter(recipe=OuterRef('pk')).order_by(
+        ).values('recipe').annotate(names=Aggregate(
+            F('ingredient__name'), Value(' '),
+            function='STRING_AGG', output_field=TextField(),
+        )).values('names'),
+        output_field=TextField(),
+    )
+
+
+def search_vector():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names(), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_fts_index(recipe_ids):
+    fts = connection.ops.quote_name(FTS_TABLE)
+    recipes = connection.ops.quote_name(Recipe._meta.db_table)
+    through = connection.ops.quote_name(IngredientRecipe._meta.db_table)
+    ingredients = connection.ops.quote_name(Ingredient._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            batch = recipe_ids[start:start + BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {fts} WHERE rowid IN ({placeholders})', batch)
+            cursor.execute(
+                f'INSERT INTO {fts} (rowid, name, text, ingredients) '
+                f'SELECT r.id, r.name, r.text, ('
+                f'SELECT group_concat(i.name, \' \') FROM {through} ri '
+                f'JOIN {ingredients} i ON i.id = ri.ingredient_id '
+                f'WHERE ri.recipe_id = r.id) '
+                f'FROM {recipes} r WHERE r.id IN ({placeholders})', batch)
+
+
+def update_search_vectors(recipes):
+    """Пересчитать поисковые данные рецептов из queryset."""
+    if connection.vendor == 'postgresql':
+        return recipes.update(search_vector=search_vector())
+    if connection.vendor == 'sqlite':
+        recipe_ids = list(recipes.values_list('pk', flat=True))
+        update_fts_index(recipe_ids)
+        return len(recipe_ids)
+    return 0
+
+
+def schedule_search_update(recipe_id):
+    """Пересчитать вектор после фиксации, когда записаны ингредиенты."""
+    transaction.on_commit(
+        lambda: update_search_vectors(Recipe.objects.filter(pk=recipe_id)))
+
+
+def remove_from_search_index(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(FTS_TABLE)} '
+                f'WHERE rowid = %s', [recipe_id])
+
+
+def fts_match(value):
+    """Запрос FTS5: все слова как префиксы, вместо морфологии."""
+    return ' '.join(
+        f'"{term}"*' for term in re.findall(r'\w+', value.lower()))
+
+
+def search_recipes(queryset, value):
+    """Рецепты, подходящие под запрос, с релевантностью rank."""
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
+    if connection.vendor != 'sqlite':
+        return queryset.filter(
+            Q(name__icontains=value) | Q(text__icontains=value))
+    match = fts_match(value)
+    if not match:
+        return queryset.none()
+    fts = connection.ops.quote_name(FTS_TABLE)
+    recipes = connection.ops.quote_name(Recipe._meta.db_table)
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    return queryset.extra(
+        where=[f'{recipes}.id IN (SELECT rowid FROM {fts} '
+               f'WHERE {fts} MATCH %s)'],
+        params=[match],
+    ).annotate(rank=RawSQL(
+        f'SELECT -bm25({fts}, {weights}) FROM {fts} '
+        f'WHERE {fts} MATCH %s AND rowid = {recipes}.id',
+        (match,), output_field=FloatField(),
+    )).order_by('-rank', '-id')
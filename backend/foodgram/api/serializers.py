@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from drf_base64.fields import Base64ImageField
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.fields import IntegerField
 from rest_framework.relations import PrimaryKeyRelatedField
@@ -7,6 +7,9 @@ from rest_framework.validators import UniqueTogetherValidator
 
 from users.models import Subscribe
 from users.serializers import CustomUserSerializer
+from .autocomplete import ingredient_index
+from .fields import Base64ImageField, RenditionField
+from .images import schedule_renditions
 from .models import (FavoriteRecipe, Ingredient, IngredientRecipe, Recipe,
                      ShoppingList, Tag)
 
@@ -39,7 +42,9 @@ class RecipeIngredientsSerializer(serializers.ModelSerializer):
 
 class RecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
-    author = CustomUserSerializer(default=serializers.CurrentUserDefault())
+    thumbnail = RenditionField('thumbnail')
+    preview = RenditionField('preview')
+    author = serializers.SerializerMethodField()
     ingredients = RecipeIngredientsSerializer(many=True,
                                               source='ingredientrecipe',
                                               read_only=True)
@@ -49,17 +54,36 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time', 'author',
-                  'ingredients', 'is_favorited', 'is_in_shopping_cart', 'text',
-                  'tags')
+        fields = ('id', 'name', 'image', 'thumbnail', 'preview',
+                  'cooking_time', 'author', 'ingredients', 'is_favorited',
+                  'is_in_shopping_cart', 'text', 'tags')
+
+    @staticmethod
+    def apply_user_flags(data, flags):
+        """Дополнить общее представление рецепта флагами пользователя."""
+        data['is_favorited'] = data['id'] in flags['favorites']
+        data['is_in_shopping_cart'] = data['id'] in flags['shopping_cart']
+        data['author']['is_subscribed'] = (
+            data['author']['id'] in flags['subscriptions'])
+        return data
+
+    def get_author(self, obj):
+        author = obj.author
+        if hasattr(obj, 'author_is_subscribed'):
+            author.is_subscribed = obj.author_is_subscribed
+        return CustomUserSerializer(author, context=self.context).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return FavoriteRecipe.objects.filter(user=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -84,6 +108,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = '__all__'
+        read_only_fields = ('thumbnail', 'preview')
 
     def validate_ingredients(self, obj):
         if obj is None:
@@ -102,6 +127,15 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 'Выбрано два одинаковых ингредиента.'
             )
 
+        unknown = set(id_ingredients) - ingredient_index.ids
+        if unknown:
+            unknown -= Ingredient.objects.in_bulk(unknown).keys()
+        if unknown:
+            raise serializers.ValidationError(
+                'Ингредиенты не найдены: '
+                f'{", ".join(map(str, sorted(unknown)))}.'
+            )
+
         for ingredient in obj:
             amount = ingredient.get('amount')
             if isinstance(amount, str) and not amount.isdigit():
@@ -143,22 +177,58 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             ) for ingredient in ingredients]
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context['request'].user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(author=author, **validated_data)
         self.create_ingredients(recipe, tags, ingredients)
+        schedule_renditions(recipe)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        """Записать только изменения в составе ингредиентов рецепта."""
+        existing = {
+            row.ingredient_id: row for row in recipe.ingredientrecipe.all()
+        }
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            row = existing.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        IngredientRecipe.objects.bulk_create(
+            [IngredientRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amounts[ingredient_id]
+            ) for ingredient_id in amounts.keys() - existing.keys()]
+        )
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         if tags is not None:
             instance.tags.set(tags)
-        ingredients = validated_data.pop('ingredients')
-        instance.ingredients.clear()
-        self.create_ingredients(instance, tags, ingredients)
-        return super().update(instance, validated_data)
+        ingredients = validated_data.pop('ingredients', None)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+        if 'image' in validated_data:
+            validated_data.update(thumbnail='', preview='')
+        recipe = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            schedule_renditions(recipe)
+        return recipe
 
     def to_representation(self, instance):
         serializer = RecipeSerializer(
@@ -169,9 +239,11 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    thumbnail = RenditionField('thumbnail')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnail', 'cooking_time')
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -192,18 +264,22 @@ class SubscribeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        return Subscribe.objects.filter(author=obj.author, user=obj.user
-                                        ).exists()
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if limit:
-            queryset = queryset[:int(limit)]
-        return RecipeShortSerializer(queryset, many=True).data
+        recipes = getattr(obj.author, 'newest_recipes', None)
+        if recipes is None:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = Recipe.objects.filter(author=obj.author)
+            if limit:
+                recipes = recipes[:int(limit)]
+        return RecipeShortSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        counters = getattr(obj.author, 'counters', None)
+        if counters is not None:
+            return counters.recipes_count
         return Recipe.objects.filter(author=obj.author).count()
 
 
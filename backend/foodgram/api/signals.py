@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Subscribe, UserCounters
+from . import feed
+from .autocomplete import ingredient_index
+from .cache import (bump_all_recipes, bump_recipes, bump_version,
+                    shopping_cart_version_key, user_flags_version_key)
+from .counters import change_recipe_counter, change_user_counter
+from .models import (FavoriteRecipe, Ingredient, IngredientRecipe, Recipe,
+                     RecipeRanking, ShoppingList, Tag)
+from .pantry import pantry_index
+from .search import (remove_from_search_index, schedule_search_update,
+                     update_search_vectors)
+
+User = get_user_model()
+
+RECIPE_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingList: 'in_carts_count',
+}
+
+
+def recipe_content_changed(recipe_id):
+    """Обновить поиск и индекс ингредиентов после фиксации транзакции."""
+    schedule_search_update(recipe_id)
+    transaction.on_commit(lambda: pantry_index.update_recipe(recipe_id))
+
+
+def bump_shopping_carts(**filters):
+    user_ids = ShoppingList.objects.filter(**filters).values_list(
+        'user_id', flat=True).distinct()
+    keys = [shopping_cart_version_key(user_id) for user_id in user_ids]
+    if keys:
+        bump_version(*keys)
+
+
+@receiver([post_save, post_delete], sender=ShoppingList)
+def shopping_list_changed(sender, instance, **kwargs):
+    bump_version(shopping_cart_version_key(instance.user_id),
+                 user_flags_version_key(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=FavoriteRecipe)
+@receiver([post_save, post_delete], sender=Subscribe)
+def user_flags_changed(sender, instance, **kwargs):
+    bump_version(user_flags_version_key(instance.user_id))
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingList)
+def recipe_list_added(sender, instance, created, **kwargs):
+    if created:
+        change_recipe_counter(instance.recipe_id, RECIPE_COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingList)
+def recipe_list_removed(sender, instance, **kwargs):
+    change_recipe_counter(instance.recipe_id, RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Subscribe)
+def subscribed(sender, instance, created, **kwargs):
+    if created:
+        change_user_counter(instance.author_id, 'followers_count', 1)
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def unsubscribed(sender, instance, **kwargs):
+    with transaction.atomic():
+        change_user_counter(instance.author_id, 'followers_count', -1)
+        # Строка счётчиков заблокирована обновлением до конца транзакции,
+        # поэтому значение — результат именно этой отписки.
+        followers = UserCounters.objects.filter(
+            user_id=instance.author_id
+        ).values_list('followers_count', flat=True).first()
+    feed.remove(instance.user_id, instance.author_id)
+    if followers == settings.FEED_FANOUT_MAX_FOLLOWERS:
+        # Автор перестал быть популярным: его рецепты больше не берутся
+        # при чтении ленты.
+        author_id = instance.author_id
+        transaction.on_commit(lambda: feed.backfill_followers(author_id))
+
+
+@receiver([post_save, post_delete], sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_recipes(instance.recipe_id)
+    bump_shopping_carts(recipe_id=instance.recipe_id)
+    recipe_content_changed(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    if not action.startswith('post_'):
+        return
+    recipe_ids = (pk_set or ()) if reverse else (instance.pk,)
+    for recipe_id in recipe_ids:
+        bump_recipes(recipe_id)
+        recipe_content_changed(recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    bump_recipes(instance.pk)
+    recipe_content_changed(instance.pk)
+    if created:
+        change_user_counter(instance.author_id, 'recipes_count', 1)
+        RecipeRanking.objects.get_or_create(recipe=instance)
+        # Рецепты, созданные не через API (админка, скрипты), тоже
+        # попадают в ленты.
+        transaction.on_commit(lambda: feed.fan_out(instance))
+    else:
+        bump_shopping_carts(recipe_id=instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    bump_recipes(instance.pk)
+    change_user_counter(instance.author_id, 'recipes_count', -1)
+    remove_from_search_index(instance.pk)
+    transaction.on_commit(lambda: pantry_index.update_recipe(instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        bump_all_recipes()
+    else:
+        bump_recipes(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    bump_all_recipes()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+    elif update_fields != frozenset(('last_login',)):
+        bump_all_recipes()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        bump_all_recipes()
+        bump_shopping_carts(recipe__ingredientrecipe__ingredient=instance)
+        transaction.on_commit(lambda: update_search_vectors(
+            Recipe.objects.filter(ingredientrecipe__ingredient=instance)))
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    ingredient_index.invalidate()
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from api.views import (IngredientViewSet, ProfilingStatsView, RecipeViewSet,
+                       TagViewSet, metrics)
 from users.views import SubscriptionsList, SubscribeView
 
 app_name = 'api'
@@ -16,5 +18,17 @@ urlpatterns = [
          name='subscriptions'),
     path(r'users/<int:user_id>/subscribe/', SubscribeView.as_view(),
          name='subscribe'),
+    path('metrics', metrics, name='metrics'),
+    path('profiling/', ProfilingStatsView.as_view(), name='profiling'),
     path('', include(router.urls))
 ]
+
+if settings.ASYNC_VIEWS:
+    from api import async_views
+
+    urlpatterns = [
+        path('recipes/', async_views.recipe_list),
+        path('recipes/download_shopping_cart/',
+             async_views.download_shopping_cart),
+        path('users/subscriptions/', async_views.subscriptions),
+    ] + urlpatterns
@@ -1,18 +1,119 @@
-from django.http.response import HttpResponse
+import csv
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.http.response import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.html import escape
+
+from .cache import get_version, shopping_cart_version_key
+from .metrics import cache_result, timed_export
+from .models import IngredientRecipe
+
+CONTENT_TYPES = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+
+class Echo:
+    """Псевдобуфер для построчной записи csv."""
+
+    def write(self, value):
+        return value
 
 
-def make_txt_response(ingredients):
-    shopping_list = 'Купить в магазине:\n'
+def render_txt(ingredients):
+    yield 'Купить в магазине:\n'.encode()
     for ingredient in ingredients:
-        shopping_list += (
+        yield (
             f'{ingredient["ingredient__name"]}: '
             f'({ingredient["ingredient__measurement_unit"]})'
             f' - {ingredient["count"]} \n'
-        )
+        ).encode()
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        ('Ингредиент', 'Единица измерения', 'Количество')).encode()
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['count'],
+        )).encode()
+
+
+def render_pdf(ingredients):
+    from weasyprint import HTML
+
+    rows = ''.join(
+        f'<tr><td>{escape(ingredient["ingredient__name"])}</td>'
+        f'<td>{escape(ingredient["ingredient__measurement_unit"])}</td>'
+        f'<td>{ingredient["count"]}</td></tr>'
+        for ingredient in ingredients
+    )
+    html = (
+        '<html><head><meta charset="utf-8"></head><body>'
+        '<h1>Купить в магазине</h1><table>'
+        '<tr><th>Ингредиент</th><th>Единица измерения</th>'
+        f'<th>Количество</th></tr>{rows}</table></body></html>'
+    )
+    yield HTML(string=html).write_pdf()
+
+
+RENDERERS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
+
+
+def cache_chunks(chunks, key):
+    content = []
+    for chunk in chunks:
+        content.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(content), settings.SHOPPING_CART_CACHE_TIMEOUT)
+
+
+def shopping_cart_ingredients(user):
+    """Суммарное количество каждого ингредиента из списка покупок."""
+    return IngredientRecipe.objects.filter(
+        recipe__shoppinglist__user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).order_by('ingredient__name').annotate(count=Sum('amount'))
+
+
+def shopping_cart_chunks(user, file_format):
+    """Части файла списка покупок из кеша или построенные заново."""
+    version = get_version(shopping_cart_version_key(user.id))
+    key = f'shopping_cart:{user.id}:{version}:{file_format}'
+    content = cache.get(key)
+    cache_result('shopping_cart', content is not None)
+    if content is None:
+        chunks = cache_chunks(RENDERERS[file_format](
+            shopping_cart_ingredients(user).iterator()), key)
+    else:
+        chunks = [content]
+    return timed_export(chunks, file_format, content is not None)
+
+
+def attachment_response(chunks, file_format):
     now = timezone.now()
     file_name = f'ingredients list{now:%Y-%m-%d}'
-    response = HttpResponse(shopping_list, content_type='text/plain')
+    response = StreamingHttpResponse(
+        chunks, content_type=CONTENT_TYPES[file_format])
     response['Content-Disposition'] = (
-        f'attachment; filename="{file_name}.txt"')
+        f'attachment; filename="{file_name}.{file_format}"')
     return response
+
+
+def make_shopping_cart_response(user, file_format):
+    return attachment_response(
+        shopping_cart_chunks(user, file_format), file_format)
@@ -1,34 +1,87 @@
-from django.db.models import Sum
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from prometheus_client import CONTENT_TYPE_LATEST
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from users.pagination import CustomPagination
+from users.pagination import CustomPagination, FeedPagination
 from users.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from .autocomplete import ingredient_index
+from .cache import get_user_flags, recipe_response_key
+from .feed import feed_recipe_ids
 from .filters import IngredientFilter, RecipeFilter
-from .models import (FavoriteRecipe, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingList, Tag)
+from .metrics import MetricsMixin, cache_result, export
+from .models import FavoriteRecipe, Ingredient, Recipe, ShoppingList, Tag
+from .profiling import get_stats, reset_stats
+from .renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from .serializers import (FavoriteSerializer, IngredientSerializer,
                           RecipeSerializer, RecipeWriteSerializer,
                           ShoppingCartSerializer, TagSerializer)
-from .utils import make_txt_response
+from .utils import make_shopping_cart_response
 
+SHOPPING_CART_RENDERERS = [PlainTextRenderer, CSVRenderer, PDFRenderer]
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(MetricsMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     pagination_class = CustomPagination
     permission_classes = [IsAuthorOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    personal_filters = ('is_favorited', 'is_in_shopping_cart')
+    # Асинхронное представление загружает флаги параллельно и
+    # накладывает их само.
+    with_user_flags = True
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.for_user(None)
+        return Recipe.objects.for_user(self.request.user)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Общее для всех пользователей тело ответа из кеша.
+
+        Флаги избранного, списка покупок и подписки накладываются
+        поверх него для каждого пользователя отдельно.
+        """
+        user = request.user
+        personal = user.is_authenticated and any(
+            name in request.query_params for name in self.personal_filters)
+        key = recipe_response_key(
+            request, kwargs.get('pk'), user.id if personal else None)
+        data = cache.get(key)
+        cache_result('recipes', data is not None)
+        if data is None:
+            data = handler(request, *args, **kwargs).data
+            cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+        if self.with_user_flags and user.is_authenticated:
+            flags = get_user_flags(user)
+            for recipe in data['results'] if 'results' in data else [data]:
+                RecipeSerializer.apply_user_flags(recipe, flags)
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeSerializer
         return RecipeWriteSerializer
 
+    @transaction.atomic
     def create_or_delete(self, request, pk, model, serializer, message):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -72,16 +125,30 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         detail=False,
         methods=['GET'],
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь."""
+        ids = self.paginator.paginate_ids(
+            lambda before, limit: feed_recipe_ids(
+                request.user, before, limit),
+            request)
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = RecipeSerializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True,
+            context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_CART_RENDERERS
     )
     def download_shopping_cart(self, request):
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shoppinglist__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).order_by('ingredient__name').annotate(count=Sum('amount'))
-        return make_txt_response(ingredients)
+        return make_shopping_cart_response(
+            request.user, request.accepted_renderer.format)
 
 
 class PermissionAndPaginationMixin:
@@ -94,8 +161,32 @@ class TagViewSet(PermissionAndPaginationMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
 
 
-class IngredientViewSet(PermissionAndPaginationMixin,
+class IngredientViewSet(MetricsMixin, PermissionAndPaginationMixin,
                         viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filterset_class = IngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(
+            name, settings.INGREDIENT_AUTOCOMPLETE_LIMIT))
+
+
+class ProfilingStatsView(APIView):
+    """Статистика профилирования запросов, только для администраторов."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_stats())
+
+    def delete(self, request):
+        reset_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def metrics(request):
+    """Метрики в текстовом формате Prometheus."""
+    return HttpResponse(export(), content_type=CONTENT_TYPE_LATEST)
@@ -61,6 +61,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# wsgi — синхронные воркеры gunicorn, asgi — воркеры uvicorn
+# с асинхронными представлениями для списка рецептов, подписок
+# и выгрузки списка покупок.
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -73,14 +79,43 @@ if DEBUG:
         }
     }
 else:
+    DB_ENGINE = os.getenv('DB_ENGINE', default='django.db.backends.postgresql')
+    DB_CONN_HEALTH_CHECKS = os.getenv(
+        'DB_CONN_HEALTH_CHECKS', default='True') == 'True'
+    if DB_ENGINE == 'django.db.backends.postgresql' and DB_CONN_HEALTH_CHECKS:
+        # Стандартный бэкенд с проверкой постоянных соединений.
+        DB_ENGINE = 'foodgram.postgresql'
     DATABASES = {
         'default': {
-            'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
+            'ENGINE': DB_ENGINE,
             'NAME': os.getenv('DB_NAME', default='postgres'),
             'USER': os.getenv('POSTGRES_USER', default='postgres'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
             'HOST': os.getenv('DB_HOST', default='db'),
-            'PORT': os.getenv('DB_PORT', default=5432)
+            'PORT': os.getenv('DB_PORT', default=5432),
+            # Секунды жизни соединения между запросами, 0 — закрывать
+            # после каждого запроса.
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            # Нужно за pgbouncer в режиме transaction: именованные
+            # курсоры не переживают смену серверного соединения.
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+                'DB_DISABLE_SERVER_SIDE_CURSORS', default='False') == 'True',
+        }
+    }
+
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         }
     }
 
@@ -141,7 +176,46 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60 * 24
+
+RECIPE_CACHE_TIMEOUT = 60 * 10
+USER_FLAGS_CACHE_TIMEOUT = 60 * 60
+
+RECIPE_IMAGE_MAX_SIZE = 15 * 1024 * 1024
+RECIPE_IMAGE_MAX_DIMENSIONS = (8000, 8000)
+RECIPE_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': {'size': (480, 480), 'format': 'WEBP', 'quality': 75},
+    'preview': {'size': (1280, 1280), 'format': 'JPEG', 'quality': 85},
+}
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+INGREDIENT_INDEX_TTL = 60 * 5
+
+PANTRY_INDEX_TTL = 60 * 5
+PANTRY_MAX_RESULTS = 1000
+
+RANKING_FAVORITE_WEIGHT = 1
+RANKING_CART_WEIGHT = 2
+RANKING_TRENDING_HALF_LIFE = 60 * 60 * 48
+RANKING_TRENDING_WINDOW = 60 * 60 * 24 * 14
+RANKING_TRENDING_REBUILD_INTERVAL = 60 * 60 * 24
+
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_BACKFILL = 50
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', default='False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0.01))
+PROFILING_N_PLUS_ONE_THRESHOLD = 5
+PROFILING_STATS_TIMEOUT = 60 * 60 * 24 * 7
+
+if PROFILING_ENABLED:
+    MIDDLEWARE.append('api.profiling.QueryProfilingMiddleware')
 
 DJOSER = {
     'LOGIN_FIELD': 'email',
@@ -0,0 +1,32 @@
+import os
+import shutil
+
+# wsgi — синхронные воркеры, asgi — воркеры uvicorn.
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+# Каждый поток воркера держит своё постоянное соединение с базой
+# (DB_CONN_MAX_AGE), так что соединений нужно workers * threads;
+# в пуле pgbouncer должно быть не меньше.
+workers = int(os.getenv('GUNICORN_WORKERS', default=1))
+threads = int(os.getenv('GUNICORN_THREADS', default=1))
+
+# Метрики воркеров хранятся в файлах этого каталога (prometheus_client).
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+
+def on_starting(server):
+    """Удалить метрики прошлого запуска."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR)
+
+
+def child_exit(server, worker):
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
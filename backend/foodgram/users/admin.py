@@ -25,5 +25,6 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'text', 'author', 'cooking_time')
+    list_display = ('id', 'name', 'text', 'author', 'cooking_time',
+                    'favorites_count')
     search_fields = ('name', 'author')
@@ -31,6 +31,38 @@ class Subscribe(models.Model):
                 name='self_subscribe'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='subscribe_author_user_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user}-{self.author}'
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, обновляются сигналами через F()."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'{self.user}: {self.recipes_count}, {self.followers_count}'
@@ -1,7 +1,81 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+
+
+class CustomCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 20
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        """Порядок, заданный фильтром, иначе порядок по умолчанию."""
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+        return super().get_ordering(request, queryset, view)
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная пагинация, с параметром cursor — курсорная.
+
+    В курсорном режиме выборка продолжается с последнего id без OFFSET
+    и без подсчёта общего числа объектов.
+    """
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 20
+    cursor_query_param = 'cursor'
+    cursor_pagination_class = CustomCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class FeedPagination(CustomCursorPagination):
+    """Курсорная пагинация ленты, собранной из нескольких выборок.
+
+    Вместо queryset принимает функцию, которая возвращает id рецептов
+    меньше позиции курсора по убыванию.
+    """
+
+    def paginate_ids(self, fetch_ids, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        before = None
+        if self.cursor is not None and self.cursor.position is not None:
+            if not self.cursor.position.isdigit():
+                raise NotFound(self.invalid_cursor_message)
+            before = int(self.cursor.position)
+        ids = fetch_ids(before, self.page_size + 1)
+        self.next_position = (
+            ids[self.page_size - 1] if len(ids) > self.page_size else None)
+        return ids[:self.page_size]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
@@ -1,3 +1,5 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import mixins, status, viewsets
@@ -6,6 +8,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api.metrics import MetricsMixin
+from api.models import Recipe
 from api.serializers import SubscribeSerializer, SubscribeUserSerializer
 from users.models import Subscribe, User
 from users.pagination import CustomPagination
@@ -33,9 +37,10 @@ class UsersViewSet(UserViewSet):
         return Response(serializer.data)
 
 
-class SubscribeView(APIView):
+class SubscribeView(MetricsMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    @transaction.atomic
     def post(self, request, user_id):
         author = get_object_or_404(User, id=user_id)
         if self.request.user == author or Subscribe.objects.filter(
@@ -51,6 +56,7 @@ class SubscribeView(APIView):
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete(self, request, user_id):
         subscription = Subscribe.objects.filter(
             user=request.user, author=user_id)
@@ -62,10 +68,28 @@ class SubscribeView(APIView):
                         status=status.HTTP_400_BAD_REQUEST)
 
 
-class SubscriptionsList(mixins.ListModelMixin, viewsets.GenericViewSet):
+def subscribed_recipes(authors, limit):
+    """Рецепты авторов, не больше limit последних у каждого."""
+    recipes = Recipe.objects.filter(author__in=authors)
+    if limit and limit.isdigit():
+        recipes = recipes.newest_per_author(int(limit))
+    return recipes
+
+
+class SubscriptionsList(MetricsMixin, mixins.ListModelMixin,
+                        viewsets.GenericViewSet):
     serializer_class = SubscribeSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPagination
 
     def get_queryset(self):
-        return Subscribe.objects.filter(user=self.request.user)
+        user = self.request.user
+        recipes = subscribed_recipes(
+            Subscribe.objects.filter(user=user).values('author'),
+            self.request.query_params.get('recipes_limit'))
+        return Subscribe.objects.filter(user=user).select_related(
+            'author', 'author__counters'
+        ).prefetch_related(
+            Prefetch('author__recipes', queryset=recipes,
+                     to_attr='newest_recipes')
+        ).order_by('-id')